@@ -0,0 +1,110 @@
+# agent_type_pipeline.py
+
+from functools import lru_cache
+import numpy as np
+import config
+import geometry
+import channel
+
+def deploy_network_arrays(num_tos, users_per_to, rng):
+    """
+    Phiên bản vector hóa của deploy_terrestrial_operators + deploy_users_around_to.
+    
+    Returns:
+        tuple: (to_xy (num_tos, 2), user_xy (num_tos * users_per_to, 2)),
+               người dùng thứ i thuộc TO thứ i // users_per_to.
+    """
+    to_xy = rng.uniform(0, 1, (num_tos, 2)) * [config.AREA_WIDTH, config.AREA_HEIGHT]
+    owners = np.repeat(to_xy, users_per_to, axis=0)
+    # Kỹ thuật phân bố điểm ngẫu nhiên đều trong hình tròn
+    radius = config.TO_CELL_RADIUS * np.sqrt(rng.uniform(0, 1, len(owners)))
+    angle = 2 * np.pi * rng.uniform(0, 1, len(owners))
+    user_xy = owners + np.column_stack((radius * np.cos(angle), radius * np.sin(angle)))
+    return to_xy, user_xy
+
+def compute_to_spectral_efficiency(to_xy, user_xy, users_per_to, sat_pos):
+    """
+    Hiệu suất phổ hiệu dụng (bit/s/Hz) của mỗi TO.
+    TO chuyển tiếp tài nguyên vệ tinh tới người dùng của mình qua hai chặng
+    (vệ tinh -> TO, TO -> người dùng); với chia sẻ thời gian tối ưu, hiệu suất
+    đầu-cuối là trung bình điều hòa: 1 / (1/SE_sat + 1/SE_terra).
+    
+    Returns:
+        np.ndarray: Hiệu suất phổ hiệu dụng của từng TO.
+    """
+    sat_gain = channel.get_satellite_channel_gain_array(sat_pos, to_xy[:, 0], to_xy[:, 1])
+    se_sat = channel.get_spectral_efficiency(sat_gain, config.SAT_TRANS_POWER_W)
+    
+    owners = np.repeat(to_xy, users_per_to, axis=0)
+    terra_gain = channel.get_terrestrial_channel_gain_array(
+        owners[:, 0], owners[:, 1], user_xy[:, 0], user_xy[:, 1])
+    se_terra_users = channel.get_spectral_efficiency(terra_gain, config.TERRA_TRANS_POWER_W)
+    se_terra = se_terra_users.reshape(len(to_xy), users_per_to).mean(axis=1)
+    
+    return 1 / (1 / se_sat + 1 / se_terra)
+
+def bucket_into_types(spectral_efficiency, num_types):
+    """
+    Chia các TO thành K nhóm theo phân vị hiệu suất phổ.
+    theta của mỗi nhóm = THETA_PER_SPECTRAL_EFFICIENCY * hiệu suất phổ trung bình của nhóm,
+    prob = tỉ lệ TO trong nhóm. Nhóm rỗng bị loại bỏ.
+    
+    Returns:
+        dict: Bảng type theo định dạng config.AGENT_TYPES, sắp xếp theo theta tăng dần.
+    """
+    edges = np.quantile(spectral_efficiency, np.linspace(0, 1, num_types + 1)[1:-1])
+    bucket = np.searchsorted(edges, spectral_efficiency, side='right')
+    counts = np.bincount(bucket, minlength=num_types)
+    sums = np.bincount(bucket, weights=spectral_efficiency, minlength=num_types)
+    
+    agent_types = {}
+    for k in np.flatnonzero(counts):
+        agent_types[f'type_{k}'] = {
+            'theta': float(config.THETA_PER_SPECTRAL_EFFICIENCY * sums[k] / counts[k]),
+            'prob': float(counts[k] / len(spectral_efficiency))
+        }
+    return agent_types
+
+def _channel_config_key():
+    """Các hằng số trong config mà hiệu suất phổ phụ thuộc vào (dùng làm khóa cache)."""
+    return tuple(getattr(config, name) for name in (
+        'AREA_WIDTH', 'AREA_HEIGHT', 'TO_CELL_RADIUS', 'SAT_ALTITUDE', 'SAT_VELOCITY',
+        'SPEED_OF_LIGHT', 'SAT_DOWNLINK_FREQ', 'TERRESTRIAL_FREQ', 'SAT_TRANS_POWER_W',
+        'TERRA_TRANS_POWER_W', 'SAT_ANTENNA_GAIN_DB', 'TERRA_ANTENNA_GAIN_DB',
+        'USER_ANTENNA_GAIN_DB', 'NOISE_POWER_W', 'TERRA_PATH_LOSS_A', 'TERRA_PATH_LOSS_B',
+        'TERRA_PATH_LOSS_C', 'RAIN_FADING_DB'))
+
+@lru_cache(maxsize=32)
+def _cached_spectral_efficiency(num_tos, seed, time_t, users_per_to, channel_config_key):
+    # channel_config_key chỉ dùng làm khóa: đổi tham số kênh truyền sẽ tính lại
+    rng = np.random.default_rng(seed)
+    to_xy, user_xy = deploy_network_arrays(num_tos, users_per_to, rng)
+    sat_pos = geometry.get_satellite_position(time_t)
+    spectral_efficiency = compute_to_spectral_efficiency(to_xy, user_xy, users_per_to, sat_pos)
+    spectral_efficiency.setflags(write=False) # Mảng dùng chung trong cache
+    return spectral_efficiency
+
+def build_agent_type_table(num_tos=None, num_types=None, seed=None, time_t=0.0, users_per_to=None):
+    """
+    Sinh bảng type từ triển khai thực tế: triển khai TO, tính độ lợi kênh vệ tinh và
+    mặt đất hàng loạt, đổi sang hiệu suất phổ rồi phân nhóm thành K type.
+    Mảng hiệu suất phổ được cache theo (num_tos, seed, time_t, users_per_to) và các hằng
+    số kênh truyền trong config; việc phân nhóm và tính theta luôn dùng config hiện tại.
+    Các tham số để None sẽ lấy từ config tại thời điểm gọi (TYPE_PIPELINE_NUM_TOS,
+    NUM_EFFICIENCY_TYPES, TYPE_PIPELINE_SEED, USERS_PER_TO).
+    
+    Returns:
+        dict: Bảng type dùng trực tiếp cho contract_solver.design_optimal_contracts
+              và baselines.solve_centralized_optimal.
+    """
+    num_tos = config.TYPE_PIPELINE_NUM_TOS if num_tos is None else num_tos
+    num_types = config.NUM_EFFICIENCY_TYPES if num_types is None else num_types
+    seed = config.TYPE_PIPELINE_SEED if seed is None else seed
+    users_per_to = config.USERS_PER_TO if users_per_to is None else users_per_to
+    spectral_efficiency = _cached_spectral_efficiency(num_tos, seed, time_t, users_per_to,
+                                                      _channel_config_key())
+    return bucket_into_types(spectral_efficiency, num_types)
+
+if __name__ == '__main__':
+    for name, params in build_agent_type_table().items():
+        print(f"{name}: theta={params['theta']:.4f}, prob={params['prob']:.4f}")
@@ -2,58 +2,78 @@
 
 import numpy as np
 import config
+import robust_solver
 from scipy.optimize import minimize
 
-def solve_centralized_optimal():
+def _analytic_centralized_allocation(thetas):
+    """
+    Nghiệm giải tích của Social Planner (dùng làm phương án dự phòng):
+    điều kiện bậc nhất theta / (1 + R) = c1 + 2*c2*R cho từng type, R >= 0.
+    """
+    c1, c2 = config.SAT_COST_C1, config.SAT_COST_C2
+    if c2 > 0:
+        b = 2 * c2 + c1
+        R = (-b + np.sqrt(np.maximum(b**2 - 8 * c2 * (c1 - thetas), 0))) / (4 * c2)
+    else:
+        R = thetas / c1 - 1
+    return np.maximum(R, 0)
+
+def _centralized_objective(R, thetas, probs, c1, c2):
+    """
+    Hàm mục tiêu: - Tổng lợi ích xã hội kỳ vọng.
+    R = [R_1, ..., R_K] (R tính theo MHz)
+    """
+    # Lợi ích xã hội từ mỗi type = lợi ích của agent - chi phí của principal
+    agent_benefit = thetas * np.log(1 + R)
+    principal_cost = c1 * R + c2 * R**2
+    welfare = agent_benefit - principal_cost
+    
+    expected_welfare = np.dot(probs, welfare)
+    return -expected_welfare
+
+def solve_centralized_optimal(agent_types=None, robust=False):
     """
     Baseline 1: Tối ưu Tập trung (Social Planner).
     Giả định: Có một bộ điều khiển toàn tri, biết hết type của các agent.
     Mục tiêu: Tối đa hóa TỔNG LỢI ÍCH XÃ HỘI (System Welfare), 
              tức là (Lợi ích từ tài nguyên của Agent) - (Chi phí của Principal).
+
+    Trả về lượng tài nguyên tối ưu (MHz) cho mỗi type, theo thứ tự các type trong
+    agent_types (mặc định config.AGENT_TYPES, tức là (R_l, R_h)).
+    Với robust=True, dùng robust_solver.robust_minimize thay cho một lần SLSQP.
     """
+    if agent_types is None:
+        agent_types = config.AGENT_TYPES
     try:
-        theta_low = config.AGENT_TYPES['low_efficiency']['theta']
-        prob_low = config.AGENT_TYPES['low_efficiency']['prob']
-        theta_high = config.AGENT_TYPES['high_efficiency']['theta']
-        prob_high = config.AGENT_TYPES['high_efficiency']['prob']
-    except (KeyError, AttributeError):
+        thetas = np.array([t['theta'] for t in agent_types.values()])
+        probs = np.array([t['prob'] for t in agent_types.values()])
+    except (KeyError, AttributeError, TypeError):
         print("ERROR: AGENT_TYPES not defined correctly in config.py")
         return None, None
 
-    def objective_function(R):
-        """
-        Hàm mục tiêu: - Tổng lợi ích xã hội kỳ vọng.
-        R = [R_l, R_h] (R tính theo MHz)
-        """
-        R_l, R_h = R
-
-        # Lợi ích xã hội từ agent loại low
-        agent_benefit_l = theta_low * np.log(1 + R_l)
-        principal_cost_l = config.SAT_COST_C1 * R_l + config.SAT_COST_C2 * R_l**2
-        welfare_l = agent_benefit_l - principal_cost_l
-
-        # Lợi ích xã hội từ agent loại high
-        agent_benefit_h = theta_high * np.log(1 + R_h)
-        principal_cost_h = config.SAT_COST_C1 * R_h + config.SAT_COST_C2 * R_h**2
-        welfare_h = agent_benefit_h - principal_cost_h
-        
-        expected_welfare = prob_low * welfare_l + prob_high * welfare_h
-        return -expected_welfare
+    c1, c2 = config.SAT_COST_C1, config.SAT_COST_C2
 
     # Ràng buộc: R >= 0
-    bounds = [(0, None), (0, None)]
-    initial_guess = [5.0, 10.0]
+    bounds = [(0, None)] * len(thetas)
+    initial_guess = np.linspace(5.0, 10.0, len(thetas))
     options = {'maxiter': 1000, 'ftol': 1e-9}
     
-    result = minimize(objective_function, initial_guess, method='SLSQP', bounds=bounds, options=options)
+    if robust:
+        R_opt, _ = robust_solver.robust_minimize(
+            _centralized_objective, initial_guess, bounds, options=options, args=(thetas, probs, c1, c2),
+            analytic_fallback=lambda: _analytic_centralized_allocation(thetas))
+        message = "all starting points and fallbacks failed"
+    else:
+        result = minimize(_centralized_objective, initial_guess, args=(thetas, probs, c1, c2), method='SLSQP', bounds=bounds, options=options)
+        R_opt = result.x if result.success else None
+        message = result.message
     
-    if result.success:
-        R_l_opt_mhz, R_h_opt_mhz = result.x
+    if R_opt is not None:
         # Trả về lượng tài nguyên tối ưu cho mỗi type
-        return max(0, R_l_opt_mhz), max(0, R_h_opt_mhz)
+        return tuple(max(0, R_opt_mhz) for R_opt_mhz in R_opt)
     else:
-        print(f"ERROR: Centralized optimization failed! {result.message}")
-        return None, None
+        print(f"ERROR: Centralized optimization failed! {message}")
+        return (None,) * len(thetas)
 
 def solve_equal_allocation(num_agents):
     """
@@ -100,3 +100,78 @@ def get_terrestrial_channel_gain(pos1, pos2):
     channel_gain = (terra_antenna_gain_linear * user_antenna_gain_linear) / path_loss_linear
     
     return channel_gain
+
+# =====================================================================
+# PHIÊN BẢN VECTOR HÓA (dùng cho tính toán hàng loạt trên mảng NumPy)
+# =====================================================================
+
+def get_terrestrial_path_loss_array(distance_m):
+    """
+    Phiên bản vector hóa của get_terrestrial_path_loss.
+    
+    Args:
+        distance_m (np.ndarray): Mảng khoảng cách (mét).
+        
+    Returns:
+        np.ndarray: Suy hao đường truyền (dạng linear).
+    """
+    distance_m = np.maximum(np.asarray(distance_m, dtype=float), 10) # Tránh log(0)
+    pl_db = (config.TERRA_PATH_LOSS_A * np.log10(distance_m) + 
+             config.TERRA_PATH_LOSS_B + 
+             config.TERRA_PATH_LOSS_C * np.log10(config.TERRESTRIAL_FREQ / 1e9))
+    return db_to_linear(pl_db)
+
+def get_satellite_channel_gain_array(sat_pos, ground_x, ground_y, rain_fading_db=None):
+    """
+    Phiên bản vector hóa của get_satellite_channel_gain cho nhiều điểm mặt đất.
+    
+    Args:
+        sat_pos (tuple): Tọa độ 3D của vệ tinh.
+        ground_x (np.ndarray): Tọa độ x của các điểm mặt đất (z=0).
+        ground_y (np.ndarray): Tọa độ y của các điểm mặt đất (z=0).
+        rain_fading_db (float | np.ndarray, optional): Suy hao do mưa (dB).
+            Mặc định là config.RAIN_FADING_DB.
+        
+    Returns:
+        np.ndarray: Độ lợi kênh (dạng linear), cùng kích thước với ground_x.
+    """
+    if rain_fading_db is None:
+        rain_fading_db = config.RAIN_FADING_DB
+    dx = np.asarray(ground_x, dtype=float) - sat_pos[0]
+    dy = np.asarray(ground_y, dtype=float) - sat_pos[1]
+    distance = np.sqrt(dx**2 + dy**2 + sat_pos[2]**2)
+    
+    path_loss_linear = get_satellite_path_loss(distance, config.SAT_DOWNLINK_FREQ)
+    antenna_gain_linear = db_to_linear(config.SAT_ANTENNA_GAIN_DB + config.USER_ANTENNA_GAIN_DB)
+    
+    return antenna_gain_linear / (path_loss_linear * db_to_linear(rain_fading_db))
+
+def get_terrestrial_channel_gain_array(x1, y1, x2, y2):
+    """
+    Phiên bản vector hóa của get_terrestrial_channel_gain.
+    
+    Args:
+        x1, y1 (np.ndarray): Tọa độ 2D của các điểm 1 (ví dụ: TO).
+        x2, y2 (np.ndarray): Tọa độ 2D của các điểm 2 (ví dụ: người dùng).
+        
+    Returns:
+        np.ndarray: Độ lợi kênh (dạng linear).
+    """
+    distance = np.hypot(np.asarray(x2, dtype=float) - x1, np.asarray(y2, dtype=float) - y1)
+    path_loss_linear = get_terrestrial_path_loss_array(distance)
+    antenna_gain_linear = db_to_linear(config.TERRA_ANTENNA_GAIN_DB + config.USER_ANTENNA_GAIN_DB)
+    return antenna_gain_linear / path_loss_linear
+
+def get_spectral_efficiency(channel_gain, trans_power_w):
+    """
+    Hiệu suất phổ Shannon (bit/s/Hz) từ độ lợi kênh: log2(1 + P*G/N).
+    
+    Args:
+        channel_gain (float | np.ndarray): Độ lợi kênh (dạng linear).
+        trans_power_w (float): Công suất phát (Watt).
+        
+    Returns:
+        float | np.ndarray: Hiệu suất phổ (bit/s/Hz).
+    """
+    snr = trans_power_w * channel_gain / config.NOISE_POWER_W
+    return np.log2(1 + snr)
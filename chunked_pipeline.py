@@ -0,0 +1,177 @@
+# chunked_pipeline.py
+
+import os
+import numpy as np
+import config
+import channel
+import geometry
+
+# Ước lượng số byte bộ nhớ tạm cần cho mỗi người dùng trong một khối:
+# tọa độ người dùng + tọa độ TO (4 x float64) và khoảng 12 mảng trung gian float64.
+BYTES_PER_USER = 16 * 8
+# Tương tự cho mỗi TO khi sinh vị trí: tọa độ (2 x float64) và mảng mẫu ngẫu nhiên (2 x float64).
+BYTES_PER_TO = 4 * 8
+
+class RunningStats:
+    """
+    Thống kê tích lũy (count, mean, std, min, max) được gộp theo từng khối
+    bằng công thức song song của Chan, không cần giữ toàn bộ dữ liệu.
+    """
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float).ravel()
+        n_b = values.size
+        if n_b == 0:
+            return
+        mean_b = values.mean()
+        m2_b = np.sum((values - mean_b)**2)
+        n_a = self.count
+        n = n_a + n_b
+        delta = mean_b - self.mean
+        self.mean += delta * n_b / n
+        self.m2 += m2_b + delta**2 * n_a * n_b / n
+        self.count = n
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+
+    def summary(self):
+        std = np.sqrt(self.m2 / self.count) if self.count > 0 else 0.0
+        return {'count': self.count, 'mean': float(self.mean), 'std': float(std),
+                'min': float(self.min), 'max': float(self.max)}
+
+def _chunk_size_for_budget(bytes_per_item, memory_budget_bytes, multiple_of=1):
+    """Số phần tử tối đa trong một khối, làm tròn xuống bội số của multiple_of."""
+    chunk = max(1, memory_budget_bytes // bytes_per_item)
+    return max(multiple_of, (chunk // multiple_of) * multiple_of)
+
+def deploy_terrestrial_operators_memmap(num_operators, path, rng, memory_budget_bytes):
+    """
+    Phân bố ngẫu nhiên các TO và ghi trực tiếp vào file .npy memory-mapped.
+    Kết quả không phụ thuộc kích thước khối (các lần rút từ rng là tuần tự).
+
+    Args:
+        num_operators (int): Số lượng TO cần phân bố.
+        path (str): Đường dẫn file .npy đầu ra.
+        rng (np.random.Generator): Bộ sinh số ngẫu nhiên.
+        memory_budget_bytes (int): Ngân sách bộ nhớ cho mỗi khối.
+
+    Returns:
+        np.memmap: Mảng (num_operators, 2) tọa độ (x, y) của các TO.
+    """
+    to_positions = np.lib.format.open_memmap(path, mode='w+', dtype=np.float64,
+                                             shape=(num_operators, 2))
+    chunk = _chunk_size_for_budget(BYTES_PER_TO, memory_budget_bytes)
+    for start in range(0, num_operators, chunk):
+        stop = min(start + chunk, num_operators)
+        samples = rng.uniform(0, 1, (stop - start, 2))
+        to_positions[start:stop, 0] = samples[:, 0] * config.AREA_WIDTH
+        to_positions[start:stop, 1] = samples[:, 1] * config.AREA_HEIGHT
+    to_positions.flush()
+    return to_positions
+
+def deploy_users_memmap(to_positions, users_per_to, cell_radius, path, rng, memory_budget_bytes):
+    """
+    Phân bố người dùng quanh từng TO và ghi trực tiếp vào file .npy memory-mapped.
+    Người dùng thứ i thuộc TO thứ i // users_per_to.
+
+    Args:
+        to_positions (np.ndarray): Mảng (num_operators, 2) tọa độ các TO.
+        users_per_to (int): Số lượng người dùng cho mỗi TO.
+        cell_radius (float): Bán kính của cell.
+        path (str): Đường dẫn file .npy đầu ra.
+        rng (np.random.Generator): Bộ sinh số ngẫu nhiên.
+        memory_budget_bytes (int): Ngân sách bộ nhớ cho mỗi khối.
+
+    Returns:
+        np.memmap: Mảng (num_operators * users_per_to, 2) tọa độ người dùng.
+    """
+    num_operators = len(to_positions)
+    user_positions = np.lib.format.open_memmap(path, mode='w+', dtype=np.float64,
+                                               shape=(num_operators * users_per_to, 2))
+    chunk_tos = _chunk_size_for_budget(BYTES_PER_USER * users_per_to, memory_budget_bytes)
+    for to_start in range(0, num_operators, chunk_tos):
+        to_stop = min(to_start + chunk_tos, num_operators)
+        owners = np.repeat(np.asarray(to_positions[to_start:to_stop]), users_per_to, axis=0)
+        samples = rng.uniform(0, 1, (len(owners), 2))
+        # Kỹ thuật phân bố điểm ngẫu nhiên đều trong hình tròn
+        radius = cell_radius * np.sqrt(samples[:, 0])
+        angle = 2 * np.pi * samples[:, 1]
+        start, stop = to_start * users_per_to, to_stop * users_per_to
+        user_positions[start:stop, 0] = owners[:, 0] + radius * np.cos(angle)
+        user_positions[start:stop, 1] = owners[:, 1] + radius * np.sin(angle)
+    user_positions.flush()
+    return user_positions
+
+def run_chunked_pipeline(num_users, users_per_to=config.USERS_PER_TO, time_t=0.0, seed=None,
+                         work_dir=config.PIPELINE_WORK_DIR,
+                         memory_budget_bytes=config.PIPELINE_MEMORY_BUDGET_BYTES):
+    """
+    Pipeline ngoài bộ nhớ (out-of-core): sinh vị trí TO và người dùng vào các file
+    .npy memory-mapped, sau đó tính độ lợi kênh và các chỉ số dẫn xuất theo từng
+    khối, chỉ giữ lại thống kê tổng hợp. Bộ nhớ sử dụng bị chặn bởi memory_budget_bytes
+    chứ không phụ thuộc vào num_users.
+
+    Args:
+        num_users (int): Tổng số người dùng (làm tròn lên bội số của users_per_to).
+        users_per_to (int): Số lượng người dùng cho mỗi TO.
+        time_t (float): Thời điểm dùng để xác định vị trí vệ tinh (giây).
+        seed (int, optional): Hạt giống cho bộ sinh số ngẫu nhiên.
+        work_dir (str): Thư mục chứa các file .npy.
+        memory_budget_bytes (int): Ngân sách bộ nhớ cho mỗi khối.
+
+    Returns:
+        dict: Thống kê (count, mean, std, min, max) cho từng chỉ số:
+              độ lợi kênh vệ tinh/mặt đất (dB), SNR (dB) và hiệu suất phổ (bit/s/Hz).
+    """
+    os.makedirs(work_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    num_operators = -(-num_users // users_per_to)
+
+    to_positions = deploy_terrestrial_operators_memmap(
+        num_operators, os.path.join(work_dir, 'to_positions.npy'), rng, memory_budget_bytes)
+    user_positions = deploy_users_memmap(
+        to_positions, users_per_to, config.TO_CELL_RADIUS,
+        os.path.join(work_dir, 'user_positions.npy'), rng, memory_budget_bytes)
+
+    sat_pos = geometry.get_satellite_position(time_t)
+    noise_db = channel.linear_to_db(config.NOISE_POWER_W)
+    sat_power_db = channel.linear_to_db(config.SAT_TRANS_POWER_W)
+    terra_power_db = channel.linear_to_db(config.TERRA_TRANS_POWER_W)
+
+    stats = {name: RunningStats() for name in (
+        'sat_gain_db', 'terra_gain_db', 'sat_snr_db', 'terra_snr_db',
+        'sat_spectral_efficiency', 'terra_spectral_efficiency')}
+
+    chunk_tos = _chunk_size_for_budget(BYTES_PER_USER * users_per_to, memory_budget_bytes)
+    for to_start in range(0, num_operators, chunk_tos):
+        to_stop = min(to_start + chunk_tos, num_operators)
+        users = np.asarray(user_positions[to_start * users_per_to:to_stop * users_per_to])
+        owners = np.repeat(np.asarray(to_positions[to_start:to_stop]), users_per_to, axis=0)
+
+        sat_gain = channel.get_satellite_channel_gain_array(sat_pos, users[:, 0], users[:, 1])
+        terra_gain = channel.get_terrestrial_channel_gain_array(
+            owners[:, 0], owners[:, 1], users[:, 0], users[:, 1])
+        sat_gain_db = channel.linear_to_db(sat_gain)
+        terra_gain_db = channel.linear_to_db(terra_gain)
+
+        stats['sat_gain_db'].update(sat_gain_db)
+        stats['terra_gain_db'].update(terra_gain_db)
+        stats['sat_snr_db'].update(sat_power_db + sat_gain_db - noise_db)
+        stats['terra_snr_db'].update(terra_power_db + terra_gain_db - noise_db)
+        stats['sat_spectral_efficiency'].update(
+            channel.get_spectral_efficiency(sat_gain, config.SAT_TRANS_POWER_W))
+        stats['terra_spectral_efficiency'].update(
+            channel.get_spectral_efficiency(terra_gain, config.TERRA_TRANS_POWER_W))
+
+    return {name: s.summary() for name, s in stats.items()}
+
+if __name__ == '__main__':
+    summary = run_chunked_pipeline(num_users=10**6, seed=0)
+    for metric, values in summary.items():
+        print(f"{metric}: " + ", ".join(f"{k}={v:.4g}" for k, v in values.items()))
@@ -44,6 +44,13 @@ TERRA_PATH_LOSS_C = 20.0
 # Suy hao do mưa cho liên kết vệ tinh (sử dụng mô hình đơn giản)
 RAIN_FADING_DB = 5 # dB, một giá trị suy hao trung bình, sẽ nâng cấp sau
 
+# Mô hình suy hao do mưa ngẫu nhiên (fading.py) cho từng liên kết, từng bước thời gian
+RAIN_FADING_MODEL = 'lognormal'  # 'fixed' (luôn bằng RAIN_FADING_DB) hoặc 'lognormal'
+RAIN_FADING_MEAN_DB = 5.0        # Giá trị trung bình của suy hao (dB)
+RAIN_FADING_STD_DB = 2.0         # Độ lệch chuẩn của suy hao (dB)
+FADING_POOL_SIZE = 2**20         # Số mẫu được sinh trong mỗi lô
+FADING_SEED = 0                  # Hạt giống gốc; mỗi đơn vị công việc (stream_key) có luồng ngẫu nhiên riêng
+
 # =====================================================================
 # THAM SỐ KINH TẾ (QUAN TRỌNG)
 # =====================================================================
@@ -67,3 +74,48 @@ AGENT_TYPES = {
 # cost = c1 * R + c2 * R^2
 SAT_COST_C1 = 0.001
 SAT_COST_C2 = 0.0005
+
+# =====================================================================
+# THAM SỐ TÍNH TOÁN QUY MÔ LỚN
+# =====================================================================
+
+# --- Pipeline chia khối (chunked) với mảng memory-mapped ---
+PIPELINE_MEMORY_BUDGET_BYTES = 256 * 1024**2 # Ngân sách bộ nhớ cho mỗi khối (256 MB)
+PIPELINE_WORK_DIR = 'results/pipeline' # Thư mục chứa các file .npy memory-mapped
+
+# --- Mô phỏng theo thời gian (epoch) khi vệ tinh di chuyển ---
+EPOCH_DURATION_S = 0.1   # Độ dài mỗi epoch (giây)
+NUM_EPOCHS = 1000        # Số epoch trong một lượt bay
+# Chỉ tính lại menu hợp đồng cho TO có độ lợi kênh vệ tinh thay đổi quá ngưỡng này
+# so với lần tính gần nhất. Với hình học phẳng 20km x 600km, độ lợi chỉ dao động
+# cỡ vài phần nghìn dB nên ngưỡng mặc định được đặt nhỏ tương ứng.
+EPOCH_GAIN_CHANGE_THRESHOLD_DB = 0.001
+
+# --- Bảng type sinh từ kênh truyền (thay cho AGENT_TYPES nhập tay) ---
+USE_CHANNEL_DERIVED_TYPES = False # True: main.py dùng bảng type sinh từ vị trí triển khai
+NUM_EFFICIENCY_TYPES = 2          # Số type K sau khi phân nhóm hiệu suất phổ
+TYPE_PIPELINE_NUM_TOS = 10000     # Số TO triển khai để ước lượng phân bố type
+TYPE_PIPELINE_SEED = 0            # Hạt giống triển khai (bảng type được cache theo seed)
+THETA_PER_SPECTRAL_EFFICIENCY = 3.0 # theta = hệ số này * hiệu suất phổ (bit/s/Hz)
+
+# --- Chế độ giải robust (nhiều điểm khởi tạo + phương án dự phòng) ---
+ROBUST_SOLVE = False          # True: main.py dùng chế độ giải robust
+ROBUST_SOLVE_NUM_STARTS = 8   # Số điểm khởi tạo cho mỗi bài toán
+ROBUST_SOLVE_MAX_WORKERS = 4  # Số process chạy song song các điểm khởi tạo (1: chạy tuần tự)
+
+# --- Backend cho các kernel tính toán (kernels.py) ---
+KERNEL_BACKEND = 'auto' # 'auto' (numba nếu đã cài), 'numba' hoặc 'numpy'
+
+# --- Quét tham số phân tán qua hàng đợi thư mục (distributed_sweep.py) ---
+SWEEP_LEASE_TIMEOUT_S = 600  # Tác vụ không được gia hạn lease quá thời gian này sẽ được đưa lại hàng đợi
+SWEEP_POLL_INTERVAL_S = 5    # Chu kỳ kiểm tra hàng đợi khi chưa có tác vụ (giây)
+
+# --- Chòm vệ tinh (constellation.py) ---
+# Mô hình phẳng giống geometry.py: các mặt phẳng quỹ đạo song song với trục x,
+# vệ tinh trong cùng mặt phẳng cách đều nhau và bay theo trục x (quay vòng theo chiều dài vùng).
+CONSTELLATION_NUM_PLANES = 24        # Số mặt phẳng quỹ đạo
+CONSTELLATION_SATS_PER_PLANE = 22    # Số vệ tinh trên mỗi mặt phẳng
+CONSTELLATION_PHASING = 1            # Hệ số lệch pha giữa các mặt phẳng liền kề (kiểu Walker)
+CONSTELLATION_AREA_WIDTH = 20000e3   # Chiều dài vùng phủ theo hướng bay (mét)
+CONSTELLATION_AREA_HEIGHT = 6000e3   # Chiều rộng vùng phủ vuông góc hướng bay (mét)
+MIN_ELEVATION_DEG = 25               # Góc ngẩng tối thiểu để coi vệ tinh là nhìn thấy (độ)
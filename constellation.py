@@ -0,0 +1,179 @@
+# constellation.py
+
+import numpy as np
+import scipy.sparse as sp
+import config
+import channel
+
+CELL_ID_STRIDE = 2**32 # Bước mã hóa chỉ số ô lưới theo trục x
+
+def propagate_constellation(time_t, num_planes=config.CONSTELLATION_NUM_PLANES,
+                            sats_per_plane=config.CONSTELLATION_SATS_PER_PLANE):
+    """
+    Tính vị trí của toàn bộ vệ tinh trong chòm tại thời điểm t (vector hóa).
+    Mở rộng mô hình của geometry.get_satellite_position cho nhiều mặt phẳng quỹ đạo.
+    
+    Args:
+        time_t (float): Thời điểm (giây).
+        num_planes (int): Số mặt phẳng quỹ đạo.
+        sats_per_plane (int): Số vệ tinh trên mỗi mặt phẳng.
+        
+    Returns:
+        np.ndarray: Mảng (num_planes * sats_per_plane, 3) tọa độ (x, y, z) của các vệ tinh.
+    """
+    length = config.CONSTELLATION_AREA_WIDTH
+    plane = np.repeat(np.arange(num_planes), sats_per_plane)
+    slot = np.tile(np.arange(sats_per_plane), num_planes)
+    
+    spacing = length / sats_per_plane
+    phase_offset = plane * config.CONSTELLATION_PHASING * spacing / num_planes
+    x_pos = (slot * spacing + phase_offset + config.SAT_VELOCITY * time_t) % length
+    y_pos = (plane + 0.5) * config.CONSTELLATION_AREA_HEIGHT / num_planes
+    z_pos = np.full(len(plane), float(config.SAT_ALTITUDE))
+    return np.column_stack((x_pos, y_pos, z_pos))
+
+def get_max_ground_range(min_elevation_deg=config.MIN_ELEVATION_DEG):
+    """Khoảng cách ngang tối đa từ điểm dưới vệ tinh để góc ngẩng >= min_elevation_deg."""
+    return config.SAT_ALTITUDE / np.tan(np.radians(min_elevation_deg))
+
+def wrap_dx(dx, period_x=config.CONSTELLATION_AREA_WIDTH):
+    """Hiệu tọa độ x theo ảnh gần nhất (minimum image) trên trục x tuần hoàn chu kỳ period_x."""
+    return (dx + period_x / 2) % period_x - period_x / 2
+
+class VisibilityIndex:
+    """
+    Chỉ mục không gian của các vệ tinh theo điểm dưới vệ tinh (sub-satellite point).
+    Mặt đất được chia thành lưới ô có cạnh không nhỏ hơn khoảng cách ngang tối đa, nên
+    mọi vệ tinh nhìn thấy được từ một điểm đều nằm trong 3x3 ô lân cận của điểm đó.
+    Trục x tuần hoàn với chu kỳ period_x (như propagate_constellation): số ô theo x là
+    floor(period_x / khoảng cách ngang tối đa) và chỉ số ô được lấy modulo; trục y không
+    tuần hoàn.
+    """
+    def __init__(self, sat_positions, min_elevation_deg=config.MIN_ELEVATION_DEG,
+                 period_x=config.CONSTELLATION_AREA_WIDTH):
+        self.sat_positions = np.asarray(sat_positions, dtype=float)
+        self.min_elevation_deg = min_elevation_deg
+        self.period_x = period_x
+        self.cell_size = get_max_ground_range(min_elevation_deg)
+        # Ô theo x chia đều chu kỳ và rộng ít nhất cell_size
+        self.num_cells_x = max(int(period_x // self.cell_size), 1)
+        self.cell_size_x = period_x / self.num_cells_x
+        
+        cell_x, cell_y = self._cell_of(self.sat_positions[:, 0], self.sat_positions[:, 1])
+        cell_ids = self._cell_id(cell_x, cell_y)
+        self._order = np.argsort(cell_ids, kind='stable')
+        self._sorted_cell_ids = cell_ids[self._order]
+
+    def _cell_of(self, x, y):
+        cell_x = np.floor(np.mod(x, self.period_x) / self.cell_size_x).astype(np.int64)
+        # Tránh làm tròn đưa x ngay sát period_x vào ô num_cells_x
+        cell_x = np.minimum(cell_x, self.num_cells_x - 1)
+        return cell_x, np.floor(y / self.cell_size).astype(np.int64)
+
+    def _cell_id(self, cell_x, cell_y):
+        # Mã hóa (cell_x, cell_y) thành một số nguyên duy nhất, kể cả chỉ số âm
+        return cell_x * CELL_ID_STRIDE + cell_y
+
+    def candidate_pairs(self, ground_x, ground_y):
+        """
+        Các cặp (điểm mặt đất, vệ tinh) ứng viên nằm trong các ô lân cận.
+        
+        Returns:
+            tuple: (chỉ số điểm mặt đất, chỉ số vệ tinh), hai mảng cùng độ dài.
+        """
+        ground_cell_x, ground_cell_y = self._cell_of(ground_x, ground_y)
+        ground_ids = self._cell_id(ground_cell_x, ground_cell_y)
+        unique_ids, first, inverse = np.unique(ground_ids, return_index=True, return_inverse=True)
+        unique_cell_x, unique_cell_y = ground_cell_x[first], ground_cell_y[first]
+        ground_order = np.argsort(inverse, kind='stable')
+        ground_bounds = np.searchsorted(inverse[ground_order], np.arange(len(unique_ids) + 1))
+        
+        # Các độ lệch theo x khác nhau sau khi lấy modulo (tránh trùng cặp khi lưới rất nhỏ)
+        offsets_x = sorted({offset % self.num_cells_x for offset in (-1, 0, 1)})
+        ground_parts, sat_parts = [], []
+        for offset_x in offsets_x:
+            for offset_y in (-1, 0, 1):
+                neighbor_ids = self._cell_id((unique_cell_x + offset_x) % self.num_cells_x,
+                                             unique_cell_y + offset_y)
+                starts = np.searchsorted(self._sorted_cell_ids, neighbor_ids, side='left')
+                stops = np.searchsorted(self._sorted_cell_ids, neighbor_ids, side='right')
+                for cell in np.flatnonzero(stops > starts):
+                    grounds = ground_order[ground_bounds[cell]:ground_bounds[cell + 1]]
+                    sats = self._order[starts[cell]:stops[cell]]
+                    ground_parts.append(np.repeat(grounds, len(sats)))
+                    sat_parts.append(np.tile(sats, len(grounds)))
+        if not ground_parts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        return np.concatenate(ground_parts), np.concatenate(sat_parts)
+
+    def visible_pairs(self, ground_x, ground_y):
+        """
+        Các cặp (điểm mặt đất, vệ tinh) có góc ngẩng >= min_elevation_deg.
+        Khoảng cách theo x được tính theo ảnh gần nhất của vệ tinh trên trục tuần hoàn.
+        
+        Returns:
+            tuple: (chỉ số điểm mặt đất, chỉ số vệ tinh, góc ngẩng (độ)).
+        """
+        ground_x = np.asarray(ground_x, dtype=float)
+        ground_y = np.asarray(ground_y, dtype=float)
+        ground_idx, sat_idx = self.candidate_pairs(ground_x, ground_y)
+        sats = self.sat_positions[sat_idx]
+        dx = wrap_dx(ground_x[ground_idx] - sats[:, 0], self.period_x)
+        horizontal = np.hypot(dx, ground_y[ground_idx] - sats[:, 1])
+        elevation_deg = np.degrees(np.arctan2(sats[:, 2], horizontal))
+        visible = elevation_deg >= self.min_elevation_deg
+        return ground_idx[visible], sat_idx[visible], elevation_deg[visible]
+
+def compute_visible_gains(sat_positions, ground_x, ground_y, min_elevation_deg=config.MIN_ELEVATION_DEG,
+                          fading_pool=None):
+    """
+    Độ lợi kênh vệ tinh - mặt đất chỉ cho các cặp nhìn thấy nhau, lưu dạng ma trận thưa.
+    Chi phí tỉ lệ với số liên kết nhìn thấy thay vì (số vệ tinh x số điểm mặt đất).
+    
+    Args:
+        sat_positions (np.ndarray): Mảng (num_sats, 3) vị trí vệ tinh.
+        ground_x, ground_y (np.ndarray): Tọa độ các điểm mặt đất (z=0).
+        min_elevation_deg (float): Góc ngẩng tối thiểu (độ).
+        fading_pool (fading.FadingPool, optional): Nếu có, mỗi liên kết nhìn thấy nhận một
+            mẫu suy hao do mưa ngẫu nhiên thay vì config.RAIN_FADING_DB.
+        
+    Returns:
+        scipy.sparse.csr_matrix: Ma trận (num_ground, num_sats) độ lợi kênh (dạng linear).
+    """
+    ground_x = np.asarray(ground_x, dtype=float)
+    ground_y = np.asarray(ground_y, dtype=float)
+    index = VisibilityIndex(sat_positions, min_elevation_deg)
+    ground_idx, sat_idx, _ = index.visible_pairs(ground_x, ground_y)
+    
+    sats = index.sat_positions[sat_idx]
+    # Dùng ảnh gần nhất của vệ tinh theo x để khoảng cách nhất quán với visible_pairs
+    sat_image_x = ground_x[ground_idx] - wrap_dx(ground_x[ground_idx] - sats[:, 0], index.period_x)
+    rain_fading_db = fading_pool.draw(len(sat_idx)) if fading_pool is not None else None
+    gains = channel.get_satellite_channel_gain_array(
+        (sat_image_x, sats[:, 1], sats[:, 2]), ground_x[ground_idx], ground_y[ground_idx], rain_fading_db)
+    return sp.csr_matrix((gains, (ground_idx, sat_idx)), shape=(len(ground_x), len(sat_positions)))
+
+def get_best_serving_satellite(gain_matrix):
+    """
+    Vệ tinh có độ lợi lớn nhất cho mỗi điểm mặt đất.
+    
+    Returns:
+        tuple: (chỉ số vệ tinh, độ lợi); chỉ số -1 và độ lợi 0 nếu không thấy vệ tinh nào.
+    """
+    gain_matrix = sp.csr_matrix(gain_matrix)
+    has_link = np.diff(gain_matrix.indptr) > 0
+    best_sat = np.full(gain_matrix.shape[0], -1)
+    best_sat[has_link] = np.asarray(gain_matrix[has_link].argmax(axis=1)).ravel()
+    best_gain = np.asarray(gain_matrix.max(axis=1).todense()).ravel()
+    return best_sat, best_gain
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(0)
+    num_ground = 100000
+    ground_xy = rng.uniform(0, 1, (num_ground, 2)) * [config.CONSTELLATION_AREA_WIDTH, config.CONSTELLATION_AREA_HEIGHT]
+    sat_positions = propagate_constellation(0.0)
+    gain_matrix = compute_visible_gains(sat_positions, ground_xy[:, 0], ground_xy[:, 1])
+    best_sat, best_gain = get_best_serving_satellite(gain_matrix)
+    print(f"{len(sat_positions)} satellites x {num_ground} ground points: {gain_matrix.nnz} visible links "
+          f"({gain_matrix.nnz / (len(sat_positions) * num_ground):.2%} of all pairs)")
+    print(f"Ground points without coverage: {np.mean(best_sat < 0):.2%}")
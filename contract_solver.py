@@ -2,9 +2,11 @@
 
 import numpy as np
 import config
+import robust_solver
 from scipy.optimize import minimize
 
 NUMERICAL_STABILITY_EPSILON = 1e-9
+IC_SAFETY_MARGIN = 1e-6 # Khoảng đệm an toàn cho ràng buộc IC của type cao hơn
 
 class Contract:
     def __init__(self, resource, payment):
@@ -34,67 +36,127 @@ def get_principal_utility(contract, agent_type_theta):
     utility = revenue - operational_cost
     return utility
 
-def design_optimal_contracts():
+def select_contract(contract_menu, agent_type_theta):
+    """
+    Agent chọn hợp đồng mang lại lợi ích dương lớn nhất trong menu.
+    Trả về (None, 0.0) nếu không có hợp đồng nào có lợi.
+    """
+    best_utility = 0.0
+    chosen_contract = None
+    for _, contract_option in contract_menu.items():
+        utility = get_agent_utility(contract_option, agent_type_theta)
+        if utility > best_utility:
+            best_utility = utility
+            chosen_contract = contract_option
+    return chosen_contract, best_utility
+
+def _analytic_contract_solution(thetas, probs):
+    """
+    Nghiệm theo cấu trúc giải tích của bài toán screening (dùng làm phương án dự phòng):
+    IR của type thấp nhất và IC hướng xuống giữa các type liền kề là chặt, R_k thỏa mãn
+    điều kiện bậc nhất với theta ảo (virtual type). Nếu R không đơn điệu theo theta,
+    R được làm đơn điệu (nghiệm khả thi nhưng có thể chưa tối ưu).
+    Trả về x = [R_1, P_1, ..., R_K, P_K] theo thứ tự ban đầu của các type.
+    """
+    thetas = np.asarray(thetas, dtype=float)
+    probs = np.asarray(probs, dtype=float)
+    order = np.argsort(thetas, kind='stable')
+    theta_sorted, prob_sorted = thetas[order], probs[order]
+
+    # theta ảo: theta_k - (theta_{k+1} - theta_k) * P(type > k) / p_k
+    tail_prob = np.cumsum(prob_sorted[::-1])[::-1] - prob_sorted
+    theta_gap = np.append(np.diff(theta_sorted), 0.0)
+    virtual_theta = theta_sorted - theta_gap * tail_prob / np.maximum(prob_sorted, NUMERICAL_STABILITY_EPSILON)
+
+    # Điều kiện bậc nhất: virtual_theta / (1 + R) = c1 + 2*c2*R
+    c1, c2 = config.SAT_COST_C1, config.SAT_COST_C2
+    if c2 > 0:
+        b = 2 * c2 + c1
+        R_sorted = (-b + np.sqrt(np.maximum(b**2 - 8 * c2 * (c1 - virtual_theta), 0))) / (4 * c2)
+    else:
+        R_sorted = virtual_theta / c1 - 1
+    R_sorted = np.maximum.accumulate(np.maximum(R_sorted, 0))
+
+    P_sorted = np.empty_like(R_sorted)
+    P_sorted[0] = _calculate_utility_from_resource(theta_sorted[0], R_sorted[0])
+    for k in range(1, len(R_sorted)):
+        P_sorted[k] = (P_sorted[k - 1] + theta_sorted[k] *
+                       (np.log(1 + R_sorted[k] + NUMERICAL_STABILITY_EPSILON) -
+                        np.log(1 + R_sorted[k - 1] + NUMERICAL_STABILITY_EPSILON)) - 2 * IC_SAFETY_MARGIN)
+
+    x = np.empty(2 * len(thetas))
+    x[0::2][order] = R_sorted
+    x[1::2][order] = P_sorted
+    return x
+
+# Hàm mục tiêu và ràng buộc ở mức module (nhận tham số qua args) để có thể
+# pickle khi robust_solver chạy các điểm khởi tạo trên process pool.
+def _objective_function(x, probs, c1, c2):
+    R, P = x[0::2], x[1::2]
+    cost = c1 * R + c2 * R**2
+    expected_utility = np.dot(probs, P - cost)
+    return -expected_utility
+
+def _constraint_ir(x, theta_k, k):
+    return _calculate_utility_from_resource(theta_k, x[2*k]) - x[2*k + 1]
+
+def _constraint_ic(x, theta_k, k, j, margin):
+    u_k_k = _calculate_utility_from_resource(theta_k, x[2*k]) - x[2*k + 1]
+    u_k_j = _calculate_utility_from_resource(theta_k, x[2*j]) - x[2*j + 1]
+    return (u_k_k - u_k_j) - margin
+
+def design_optimal_contracts(agent_types=None, robust=False):
+    """
+    Thiết kế menu hợp đồng tối ưu cho K type bất kỳ (mặc định config.AGENT_TYPES).
+    Biến tối ưu x = [R_1, P_1, ..., R_K, P_K] (R tính theo MHz), theo thứ tự
+    các type trong agent_types.
+    Với robust=True, dùng robust_solver.robust_minimize (nhiều điểm khởi tạo,
+    dự phòng bằng trust-constr và nghiệm giải tích) thay cho một lần SLSQP.
+    """
+    if agent_types is None:
+        agent_types = config.AGENT_TYPES
     try:
-        theta_low = config.AGENT_TYPES['low_efficiency']['theta']
-        prob_low = config.AGENT_TYPES['low_efficiency']['prob']
-        theta_high = config.AGENT_TYPES['high_efficiency']['theta']
-        prob_high = config.AGENT_TYPES['high_efficiency']['prob']
-    except (KeyError, AttributeError):
+        type_names = list(agent_types.keys())
+        thetas = [agent_types[t]['theta'] for t in type_names]
+        probs = [agent_types[t]['prob'] for t in type_names]
+    except (KeyError, AttributeError, TypeError):
         print("ERROR: AGENT_TYPES not defined correctly in config.py")
         return None
-
-    def objective_function(x):
-        R_l, P_l, R_h, P_h = x
-        cost_l = config.SAT_COST_C1 * R_l + config.SAT_COST_C2 * R_l**2
-        util_l = P_l - cost_l
-        cost_h = config.SAT_COST_C1 * R_h + config.SAT_COST_C2 * R_h**2
-        util_h = P_h - cost_h
-        expected_utility = prob_low * util_l + prob_high * util_h
-        return -expected_utility
-
-    def constraint_ir_low(x):
-        return _calculate_utility_from_resource(theta_low, x[0]) - x[1]
-
-    def constraint_ir_high(x):
-        return _calculate_utility_from_resource(theta_high, x[2]) - x[3]
-
-    def constraint_ic_low(x):
-        u_l_l = _calculate_utility_from_resource(theta_low, x[0]) - x[1]
-        u_l_h = _calculate_utility_from_resource(theta_low, x[2]) - x[3]
-        return u_l_l - u_l_h
-
-    def constraint_ic_high(x):
-        u_h_h = _calculate_utility_from_resource(theta_high, x[2]) - x[3]
-        u_h_l = _calculate_utility_from_resource(theta_high, x[0]) - x[1]
-        # =====================================================================
-        # SỬA LỖI QUAN TRỌNG: Siết chặt ràng buộc IC-high
-        # Yêu cầu U_h(h) phải lớn hơn U_h(l) một chút.
-        # =====================================================================
-        return (u_h_h - u_h_l) - 1e-6 # Thêm một khoảng đệm an toàn
-
-    constraints = [
-        {'type': 'ineq', 'fun': constraint_ir_low},
-        {'type': 'ineq', 'fun': constraint_ir_high},
-        {'type': 'ineq', 'fun': constraint_ic_low},
-        {'type': 'ineq', 'fun': constraint_ic_high}
-    ]
+    num_types = len(type_names)
+
+    c1, c2 = config.SAT_COST_C1, config.SAT_COST_C2
+    # =====================================================================
+    # SỬA LỖI QUAN TRỌNG: Siết chặt ràng buộc IC của type cao hơn
+    # Yêu cầu U_k(k) phải lớn hơn U_k(j) một chút khi theta_k > theta_j.
+    # =====================================================================
+    constraints = [{'type': 'ineq', 'fun': _constraint_ir, 'args': (thetas[k], k)}
+                   for k in range(num_types)]
+    constraints += [{'type': 'ineq', 'fun': _constraint_ic,
+                     'args': (thetas[k], k, j, IC_SAFETY_MARGIN if thetas[k] > thetas[j] else 0.0)}
+                    for k in range(num_types) for j in range(num_types) if j != k]
     
-    bounds = [(0, None), (None, None), (0, None), (None, None)]
-    initial_guess = [5.0, 1.0, 10.0, 2.0]
+    bounds = [(0, None), (None, None)] * num_types
+    initial_guess = np.empty(2 * num_types)
+    initial_guess[0::2] = np.linspace(5.0, 10.0, num_types)
+    initial_guess[1::2] = np.linspace(1.0, 2.0, num_types)
     options = {'maxiter': 1000, 'ftol': 1e-9}
     
-    result = minimize(objective_function, initial_guess, method='SLSQP', bounds=bounds, constraints=constraints, options=options)
+    if robust:
+        x_opt, _ = robust_solver.robust_minimize(
+            _objective_function, initial_guess, bounds, constraints, options, args=(probs, c1, c2),
+            analytic_fallback=lambda: _analytic_contract_solution(thetas, probs))
+        if x_opt is None:
+            print("ERROR: Optimization failed for all starting points and fallbacks!")
+            return None
+    else:
+        result = minimize(_objective_function, initial_guess, args=(probs, c1, c2), method='SLSQP', bounds=bounds, constraints=constraints, options=options)
+        x_opt = result.x if result.success else None
     
-    if result.success:
-        R_l_opt_mhz, P_l_opt, R_h_opt_mhz, P_h_opt = result.x
-        R_l_opt_mhz = max(0, R_l_opt_mhz)
-        R_h_opt_mhz = max(0, R_h_opt_mhz)
-
-        optimal_menu = {
-            'low_efficiency': Contract(resource=R_l_opt_mhz * 1e6, payment=P_l_opt),
-            'high_efficiency': Contract(resource=R_h_opt_mhz * 1e6, payment=P_h_opt)
-        }
+    if x_opt is not None:
+        optimal_menu = {}
+        for k, name in enumerate(type_names):
+            R_opt_mhz = max(0, x_opt[2*k])
+            optimal_menu[name] = Contract(resource=R_opt_mhz * 1e6, payment=x_opt[2*k + 1])
         return optimal_menu
     else:
         print(f"ERROR: Optimization failed! {result.message}")
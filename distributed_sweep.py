@@ -0,0 +1,347 @@
+# distributed_sweep.py
+#
+# Phân phối vòng lặp quét tham số của main.py lên nhiều tiến trình / nhiều máy
+# thông qua một hàng đợi dạng thư mục trên ổ đĩa dùng chung.
+#
+# Cấu trúc thư mục hàng đợi:
+#   tasks/<id>.json    Mô tả tác vụ (không thay đổi sau khi tạo)
+#   pending/<id>       Tác vụ đang chờ
+#   claimed/<id>.<token>  Tác vụ đã được một worker nhận (mtime = lần gia hạn lease gần nhất)
+#   done/<id>.json     Kết quả của tác vụ
+#   failed/<id>.json   Lỗi của tác vụ thất bại (không được chạy lại tự động)
+#
+# Worker nhận tác vụ bằng os.rename(pending/<id>, claimed/<id>.<token>), thao tác nguyên
+# tử trên cùng hệ thống file nên mỗi tác vụ chỉ được một worker nhận. Token là ngẫu
+# nhiên cho mỗi lần nhận, nên worker chỉ gia hạn / xóa đúng claim của mình: tác vụ có
+# lease hết hạn (worker chết hoặc treo) được đưa trở lại pending/ và claim mới của
+# worker khác có tên khác.
+#
+# Cách dùng (có thể chạy nhiều worker trên một hoặc nhiều máy):
+#   python distributed_sweep.py init   --queue /shared/sweep --param SAT_COST_C1=0.001,0.002
+#   python distributed_sweep.py worker --queue /shared/sweep
+#   python distributed_sweep.py merge  --queue /shared/sweep
+#   python distributed_sweep.py local  --queue /tmp/sweep --workers 4   # thử trên một máy
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import shutil
+import socket
+import threading
+import time
+import traceback
+import uuid
+import numpy as np
+import pandas as pd
+import config
+import main
+
+SUBDIRS = ('tasks', 'pending', 'claimed', 'done', 'failed')
+
+# Các tham số config có thể quét: chỉ những tham số được đọc tại thời điểm gọi
+# (không bị chụp làm giá trị mặc định lúc import) nên ghi đè tạm thời mới có hiệu lực.
+# Các tham số trong CHANNEL_TYPE_PARAMETERS chỉ có tác dụng (và chỉ được chấp nhận)
+# khi USE_CHANNEL_DERIVED_TYPES = True.
+CHANNEL_TYPE_PARAMETERS = ('THETA_PER_SPECTRAL_EFFICIENCY', 'NUM_EFFICIENCY_TYPES',
+                           'TYPE_PIPELINE_NUM_TOS', 'TYPE_PIPELINE_SEED')
+SWEEP_PARAMETERS = ('SAT_COST_C1', 'SAT_COST_C2', 'TOTAL_SAT_RESOURCE_B_HZ') + CHANNEL_TYPE_PARAMETERS
+
+def _check_sweep_parameters(names):
+    """Ném ValueError nếu có tham số không quét được hoặc không có tác dụng với config hiện tại."""
+    unsupported = [name for name in names if name not in SWEEP_PARAMETERS]
+    if unsupported:
+        raise ValueError(f"Parameters cannot be swept: {', '.join(unsupported)}; "
+                         f"choose from {', '.join(SWEEP_PARAMETERS)}")
+    ineffective = [name for name in names if name in CHANNEL_TYPE_PARAMETERS]
+    if ineffective and not config.USE_CHANNEL_DERIVED_TYPES:
+        raise ValueError(f"Parameters {', '.join(ineffective)} only take effect with "
+                         f"USE_CHANNEL_DERIVED_TYPES = True")
+
+def _write_json_atomic(path, payload):
+    """Ghi file JSON qua file tạm rồi os.replace để người đọc không thấy file dở dang."""
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(payload, f)
+    os.replace(tmp_path, path)
+
+def _read_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+def create_sweep(queue_dir, num_tos_range=None, scenarios=None, num_runs=None,
+                 param_grid=None, runs_per_task=None, seed=0, reset=False):
+    """
+    Coordinator: chia lưới quét thành các tác vụ và ghi vào hàng đợi.
+
+    Args:
+        queue_dir (str): Thư mục hàng đợi dùng chung.
+        num_tos_range (list, optional): Các giá trị số TO, mặc định main.NUM_TOS_RANGE.
+        scenarios (list, optional): Các kịch bản, mặc định main.SCENARIOS_TO_RUN.
+        num_runs (int, optional): Số lần chạy mỗi ô, mặc định main.NUM_SIMULATION_RUNS.
+        param_grid (dict, optional): {tên tham số trong config: [các giá trị]} cho
+            các tham số cần quét (ví dụ SAT_COST_C1), nằm trong SWEEP_PARAMETERS; các tham
+            số CHANNEL_TYPE_PARAMETERS cần USE_CHANNEL_DERIVED_TYPES = True.
+        runs_per_task (int, optional): Số lần chạy trong một tác vụ (mặc định num_runs,
+            tức mỗi ô là một tác vụ).
+        seed (int): Hạt giống gốc; mỗi tác vụ có hạt giống riêng suy ra từ đây.
+        reset (bool): Xóa tác vụ và kết quả của lần quét trước trong queue_dir. Nếu False
+            và hàng đợi chưa rỗng, ném ValueError (tránh trộn kết quả của hai lần quét).
+
+    Returns:
+        int: Số tác vụ đã tạo.
+    """
+    num_tos_range = num_tos_range or main.NUM_TOS_RANGE
+    scenarios = scenarios or main.SCENARIOS_TO_RUN
+    num_runs = num_runs or main.NUM_SIMULATION_RUNS
+    runs_per_task = runs_per_task or num_runs
+    param_grid = param_grid or {}
+    _check_sweep_parameters(param_grid)
+
+    leftovers = {subdir: len(os.listdir(os.path.join(queue_dir, subdir))) for subdir in SUBDIRS
+                 if os.path.isdir(os.path.join(queue_dir, subdir))}
+    if any(leftovers.values()):
+        if not reset:
+            raise ValueError(f"Queue '{queue_dir}' already holds a sweep {leftovers}; "
+                             f"use reset=True (--reset) to clear it or choose another queue directory")
+        for subdir in leftovers:
+            shutil.rmtree(os.path.join(queue_dir, subdir))
+    for subdir in SUBDIRS:
+        os.makedirs(os.path.join(queue_dir, subdir), exist_ok=True)
+
+    param_names = list(param_grid.keys())
+    task_index = 0
+    for param_values in itertools.product(*(param_grid[name] for name in param_names)):
+        overrides = dict(zip(param_names, param_values))
+        for n_tos in num_tos_range:
+            for scenario in scenarios:
+                for run_start in range(0, num_runs, runs_per_task):
+                    task_id = f"task_{task_index:06d}"
+                    task = {
+                        'task_id': task_id,
+                        'task_index': task_index,
+                        'scenario': scenario,
+                        'num_tos': n_tos,
+                        'num_runs': min(runs_per_task, num_runs - run_start),
+                        'config_overrides': overrides,
+                        'seed': int(np.random.SeedSequence([seed, task_index]).generate_state(1)[0])
+                    }
+                    _write_json_atomic(os.path.join(queue_dir, 'tasks', f"{task_id}.json"), task)
+                    open(os.path.join(queue_dir, 'pending', task_id), 'w').close()
+                    task_index += 1
+    return task_index
+
+def requeue_expired(queue_dir, lease_timeout_s=config.SWEEP_LEASE_TIMEOUT_S):
+    """Đưa các tác vụ có lease hết hạn (worker không còn gia hạn) trở lại pending/."""
+    claimed_dir = os.path.join(queue_dir, 'claimed')
+    now = time.time()
+    requeued = 0
+    for claim_name in os.listdir(claimed_dir):
+        claim_path = os.path.join(claimed_dir, claim_name)
+        task_id = claim_name.split('.', 1)[0]
+        try:
+            if now - os.path.getmtime(claim_path) > lease_timeout_s:
+                os.rename(claim_path, os.path.join(queue_dir, 'pending', task_id))
+                requeued += 1
+        except FileNotFoundError:
+            pass # Worker khác vừa hoàn thành hoặc đưa lại tác vụ này
+    return requeued
+
+def claim_task(queue_dir, worker_id):
+    """
+    Nhận một tác vụ đang chờ.
+    Trả về (task_id, claim_path) hoặc (None, None) nếu hàng đợi rỗng; claim_path chứa
+    token riêng của lần nhận này.
+    """
+    for task_id in sorted(os.listdir(os.path.join(queue_dir, 'pending'))):
+        pending_path = os.path.join(queue_dir, 'pending', task_id)
+        claim_path = os.path.join(queue_dir, 'claimed', f"{task_id}.{uuid.uuid4().hex}")
+        try:
+            # Làm mới mtime trước khi đổi tên để lease bắt đầu tính từ lúc nhận
+            os.utime(pending_path)
+            os.rename(pending_path, claim_path)
+        except FileNotFoundError:
+            continue # Worker khác đã nhận trước
+        with open(claim_path, 'w') as f:
+            f.write(worker_id)
+        return task_id, claim_path
+    return None, None
+
+def _renew_lease(claim_path, stop_event, interval_s):
+    while not stop_event.wait(interval_s):
+        try:
+            os.utime(claim_path)
+        except FileNotFoundError:
+            return # Claim đã hết hạn và tác vụ bị đưa lại hàng đợi
+
+def _release_claim(claim_path):
+    """Xóa claim của chính worker. Trả về False nếu claim đã bị thu hồi."""
+    try:
+        os.remove(claim_path)
+        return True
+    except FileNotFoundError:
+        return False
+
+def execute_task(task):
+    """Chạy một tác vụ với các tham số config được ghi đè tạm thời."""
+    saved = {name: getattr(config, name) for name in task['config_overrides']}
+    try:
+        for name, value in task['config_overrides'].items():
+            setattr(config, name, value)
+        np.random.seed(task['seed'])
+        agent_types = main.get_agent_types()
+        return main.run_repeated_simulations(task['scenario'], task['num_tos'], task['num_runs'], agent_types)
+    finally:
+        for name, value in saved.items():
+            setattr(config, name, value)
+
+def run_worker(queue_dir, worker_id=None, lease_timeout_s=config.SWEEP_LEASE_TIMEOUT_S,
+               poll_interval_s=config.SWEEP_POLL_INTERVAL_S, exit_when_idle=True):
+    """
+    Worker: lặp lại việc nhận tác vụ, thực thi và ghi kết quả vào done/.
+    Lease được gia hạn định kỳ trong khi chạy; các tác vụ có lease hết hạn được
+    đưa lại hàng đợi trước mỗi lần nhận. Worker chỉ ghi kết quả nếu vẫn giữ claim;
+    tác vụ ném ngoại lệ được ghi vào failed/ kèm thông báo lỗi.
+
+    Returns:
+        int: Số tác vụ worker đã hoàn thành.
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    completed = 0
+    while True:
+        requeue_expired(queue_dir, lease_timeout_s)
+        task_id, claim_path = claim_task(queue_dir, worker_id)
+        if task_id is None:
+            if exit_when_idle and not os.listdir(os.path.join(queue_dir, 'claimed')):
+                return completed
+            time.sleep(poll_interval_s)
+            continue
+
+        stop_event = threading.Event()
+        heartbeat = threading.Thread(target=_renew_lease, args=(claim_path, stop_event, lease_timeout_s / 3),
+                                     daemon=True)
+        heartbeat.start()
+        error = None
+        try:
+            task = _read_json(os.path.join(queue_dir, 'tasks', f"{task_id}.json"))
+            run_principal_utils, run_agents_utils = execute_task(task)
+        except Exception:
+            error = traceback.format_exc()
+        finally:
+            stop_event.set()
+            heartbeat.join()
+
+        if not os.path.exists(claim_path):
+            # Lease đã hết hạn: tác vụ thuộc về worker khác (hoặc đang chờ lại)
+            print(f"[{worker_id}] lost claim on {task_id}, discarding result")
+            continue
+        if error is not None:
+            _write_json_atomic(os.path.join(queue_dir, 'failed', f"{task_id}.json"), {
+                'task_id': task_id,
+                'worker_id': worker_id,
+                'error': error
+            })
+            _release_claim(claim_path)
+            print(f"ERROR: [{worker_id}] task {task_id} failed, moved to failed/:\n{error}")
+            continue
+
+        # Kết quả là xác định theo seed nên ghi đè khi tác vụ bị chạy lại là an toàn
+        _write_json_atomic(os.path.join(queue_dir, 'done', f"{task_id}.json"), {
+            'task_id': task_id,
+            'worker_id': worker_id,
+            'principal_utils': run_principal_utils,
+            'agents_utils': run_agents_utils
+        })
+        _release_claim(claim_path)
+        completed += 1
+        print(f"[{worker_id}] completed {task_id} ({task['scenario']}, {task['num_tos']} TOs)")
+
+def queue_status(queue_dir):
+    """Số tác vụ ở mỗi trạng thái."""
+    return {subdir: len(os.listdir(os.path.join(queue_dir, subdir))) for subdir in SUBDIRS}
+
+def merge_results(queue_dir, output_path=main.RESULTS_CSV_PATH):
+    """
+    Gộp kết quả của mọi tác vụ thành file CSV cùng định dạng với main.py
+    (thêm một cột cho mỗi tham số kinh tế được quét).
+
+    Returns:
+        pd.DataFrame: Bảng kết quả đã gộp.
+    """
+    status = queue_status(queue_dir)
+    if status['done'] < status['tasks']:
+        print(f"WARNING: only {status['done']}/{status['tasks']} tasks are done "
+              f"({status['failed']} failed), merging partial results")
+
+    cells = {}
+    for task_file in sorted(os.listdir(os.path.join(queue_dir, 'tasks'))):
+        task = _read_json(os.path.join(queue_dir, 'tasks', task_file))
+        key = (json.dumps(task['config_overrides'], sort_keys=True), task['num_tos'], task['scenario'])
+        cell = cells.setdefault(key, {'task': task, 'principal_utils': [], 'agents_utils': []})
+        result_path = os.path.join(queue_dir, 'done', task_file)
+        if os.path.exists(result_path):
+            result = _read_json(result_path)
+            cell['principal_utils'].extend(result['principal_utils'])
+            cell['agents_utils'].extend(result['agents_utils'])
+
+    rows = []
+    for cell in cells.values():
+        task = cell['task']
+        row = dict(task['config_overrides'])
+        row.update(main.summarize_runs(task['scenario'], task['num_tos'],
+                                       cell['principal_utils'], cell['agents_utils']))
+        rows.append(row)
+    results_df = pd.DataFrame(rows)
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    results_df.to_csv(output_path, index=False)
+    print(f"Merged {len(rows)} sweep cells into '{output_path}'")
+    return results_df
+
+def _parse_param_grid(param_args):
+    """Đọc các đối số --param NAME=v1,v2,...; giá trị được ép về kiểu của tham số trong config."""
+    param_grid = {}
+    for arg in param_args or []:
+        name, values = arg.split('=', 1)
+        _check_sweep_parameters([name])
+        param_type = type(getattr(config, name))
+        param_grid[name] = [param_type(v) for v in values.split(',')]
+    return param_grid
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Distributed parameter sweep over a file-based work queue.")
+    parser.add_argument('command', choices=['init', 'worker', 'merge', 'status', 'local'])
+    parser.add_argument('--queue', required=True, help="Shared queue directory")
+    parser.add_argument('--param', action='append', help=f"Parameter grid, e.g. SAT_COST_C1=0.001,0.002 (one of: {', '.join(SWEEP_PARAMETERS)})")
+    parser.add_argument('--num-tos', type=int, nargs='+', default=None, help="Values of the number of TOs")
+    parser.add_argument('--num-runs', type=int, default=None, help="Simulation runs per sweep cell")
+    parser.add_argument('--runs-per-task', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=4, help="Number of local worker processes ('local' only)")
+    parser.add_argument('--output', default=main.RESULTS_CSV_PATH)
+    parser.add_argument('--reset', action='store_true',
+                        help="Clear tasks and results of a previous sweep in --queue ('init'/'local' only)")
+    args = parser.parse_args()
+
+    if args.command in ('init', 'local'):
+        try:
+            num_tasks = create_sweep(args.queue, num_tos_range=args.num_tos, num_runs=args.num_runs,
+                                     param_grid=_parse_param_grid(args.param),
+                                     runs_per_task=args.runs_per_task, seed=args.seed, reset=args.reset)
+        except ValueError as e:
+            print(f"ERROR: {e}")
+            raise SystemExit(1)
+        print(f"Created {num_tasks} tasks in '{args.queue}'")
+    if args.command == 'worker':
+        run_worker(args.queue)
+    if args.command == 'local':
+        workers = [multiprocessing.Process(target=run_worker, args=(args.queue, f"local-{i}"))
+                   for i in range(args.workers)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    if args.command in ('merge', 'local'):
+        merge_results(args.queue, args.output)
+    if args.command == 'status':
+        print(queue_status(args.queue))
@@ -0,0 +1,128 @@
+# epoch_simulation.py
+
+import numpy as np
+import pandas as pd
+import config
+import geometry
+import channel
+import contract_solver
+
+def get_reference_spectral_efficiency():
+    """Hiệu suất phổ của liên kết vệ tinh khi vệ tinh ở thiên đỉnh (dùng để chuẩn hóa)."""
+    zenith_gain = channel.get_satellite_channel_gain_array(
+        (0.0, 0.0, config.SAT_ALTITUDE), np.zeros(1), np.zeros(1))
+    return channel.get_spectral_efficiency(zenith_gain, config.SAT_TRANS_POWER_W)[0]
+
+def scale_agent_types(agent_types, link_scale):
+    """
+    Hiệu quả (theta) hiệu dụng của mỗi type tỉ lệ với chất lượng liên kết vệ tinh
+    của TO (link_scale = hiệu suất phổ hiện tại / hiệu suất phổ tham chiếu).
+    """
+    return {name: {'theta': t['theta'] * link_scale, 'prob': t['prob']}
+            for name, t in agent_types.items()}
+
+def simulate_satellite_pass(num_tos=config.NUM_TO, num_epochs=config.NUM_EPOCHS,
+                            epoch_duration_s=config.EPOCH_DURATION_S,
+                            threshold_db=config.EPOCH_GAIN_CHANGE_THRESHOLD_DB,
+                            agent_types=None, fading_pool=None):
+    """
+    Mô phỏng theo thời gian trong một lượt bay của vệ tinh LEO.
+    Vị trí TO là công khai nên Principal thiết kế cho mỗi TO một menu hợp đồng riêng
+    dựa trên chất lượng liên kết vệ tinh của TO đó; type (theta) vẫn là thông tin riêng.
+    Ở mỗi epoch, menu và lựa chọn hợp đồng chỉ được tính lại cho các TO có độ lợi
+    kênh thay đổi quá threshold_db so với lần tính gần nhất; các TO còn lại dùng kết
+    quả đã lưu.
+
+    Quyết định tính lại menu luôn dựa trên độ lợi danh định (hình học, suy hao mưa
+    config.RAIN_FADING_DB). Suy hao mưa ngẫu nhiên (fading_pool) được áp dụng riêng:
+    mẫu suy hao độc lập giữa các epoch (không tương quan theo thời gian) chỉ làm thay
+    đổi theta thực tế của TO, nên mỗi epoch mọi TO chọn lại hợp đồng trong menu đã lưu
+    (rẻ) thay vì thiết kế lại menu (đắt).
+
+    Args:
+        num_tos (int): Số lượng TO.
+        num_epochs (int): Số epoch mô phỏng.
+        epoch_duration_s (float): Độ dài mỗi epoch (giây).
+        threshold_db (float): Ngưỡng thay đổi độ lợi kênh (dB) để tính lại.
+        agent_types (dict, optional): Bảng type, mặc định là config.AGENT_TYPES.
+        fading_pool (fading.FadingPool, optional): Nếu có, mỗi TO nhận một mẫu suy hao
+            do mưa ngẫu nhiên ở mỗi epoch thay vì config.RAIN_FADING_DB khi chọn hợp đồng
+            (menu vẫn được thiết kế theo độ lợi danh định).
+
+    Returns:
+        pd.DataFrame: Mỗi dòng là một epoch với số TO được tính lại và tổng lợi ích.
+    """
+    if agent_types is None:
+        agent_types = config.AGENT_TYPES
+
+    to_positions = np.array(geometry.deploy_terrestrial_operators(num_tos))
+    type_names = list(agent_types.keys())
+    type_probs = [agent_types[t]['prob'] for t in type_names]
+    assigned_types = np.random.choice(type_names, size=num_tos, p=type_probs)
+    reference_se = get_reference_spectral_efficiency()
+
+    # Bộ đệm cho từng TO: độ lợi (dB) tại lần tính gần nhất và kết quả phân bổ
+    cached_gain_db = np.full(num_tos, np.nan)
+    cached_menus = [None] * num_tos
+    cached_principal_utility = np.zeros(num_tos)
+    cached_agent_utility = np.zeros(num_tos)
+
+    epoch_records = []
+    for epoch in range(num_epochs):
+        time_t = epoch * epoch_duration_s
+        sat_pos = geometry.get_satellite_position(time_t)
+        gains = channel.get_satellite_channel_gain_array(sat_pos, to_positions[:, 0], to_positions[:, 1])
+        gain_db = channel.linear_to_db(gains)
+
+        # TO chưa có kết quả (NaN) luôn được tính
+        stale = ~(np.abs(gain_db - cached_gain_db) <= threshold_db)
+        link_scale = channel.get_spectral_efficiency(gains, config.SAT_TRANS_POWER_W) / reference_se
+
+        num_failed = 0
+        reselect = []
+        for i in np.flatnonzero(stale):
+            contract_menu = contract_solver.design_optimal_contracts(scale_agent_types(agent_types, link_scale[i]))
+            if not contract_menu:
+                # Giữ kết quả cũ, thử lại ở epoch sau
+                num_failed += 1
+                continue
+            cached_menus[i] = contract_menu
+            cached_gain_db[i] = gain_db[i]
+            reselect.append(i)
+
+        if fading_pool is not None:
+            # Theta thực tế theo độ lợi có suy hao mưa ngẫu nhiên; mọi TO đã có menu chọn lại
+            faded_gains = channel.get_satellite_channel_gain_array(
+                sat_pos, to_positions[:, 0], to_positions[:, 1], fading_pool.draw(num_tos))
+            link_scale = channel.get_spectral_efficiency(faded_gains, config.SAT_TRANS_POWER_W) / reference_se
+            reselect = [i for i in range(num_tos) if cached_menus[i] is not None]
+
+        for i in reselect:
+            my_true_theta = agent_types[assigned_types[i]]['theta'] * link_scale[i]
+            chosen_contract, best_utility = contract_solver.select_contract(cached_menus[i], my_true_theta)
+            if chosen_contract:
+                cached_agent_utility[i] = best_utility
+                cached_principal_utility[i] = contract_solver.get_principal_utility(chosen_contract, my_true_theta)
+            else:
+                cached_agent_utility[i] = 0.0
+                cached_principal_utility[i] = 0.0
+
+        total_principal_utility = cached_principal_utility.sum()
+        total_agents_utility = cached_agent_utility.sum()
+        epoch_records.append({
+            'Epoch': epoch,
+            'Time (s)': time_t,
+            'Recomputed TOs': int(stale.sum()) - num_failed,
+            'Failed TOs': num_failed,
+            'Principal Utility': total_principal_utility,
+            'Agents Utility': total_agents_utility,
+            'Social Welfare': total_principal_utility + total_agents_utility
+        })
+
+    return pd.DataFrame(epoch_records)
+
+if __name__ == '__main__':
+    epochs_df = simulate_satellite_pass()
+    print(epochs_df)
+    print(f"\nTotal menu recomputations: {epochs_df['Recomputed TOs'].sum()} "
+          f"over {len(epochs_df)} epochs x {config.NUM_TO} TOs")
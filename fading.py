@@ -0,0 +1,116 @@
+# fading.py
+
+import numpy as np
+import config
+import channel
+
+def get_lognormal_parameters(mean_db, std_db):
+    """Tham số (mu, sigma) của phân phối log-normal có trung bình mean_db và độ lệch chuẩn std_db."""
+    sigma_sq = np.log(1 + (std_db / mean_db)**2)
+    return np.log(mean_db) - sigma_sq / 2, np.sqrt(sigma_sq)
+
+class FadingPool:
+    """
+    Bể mẫu suy hao do mưa (dB) được sinh trước theo lô lớn từ một bộ sinh có seed.
+    Các lần lấy mẫu chỉ cắt lát từ bể nên không có chi phí gọi RNG cho từng liên kết;
+    khi bể trong RAM cạn, một lô mới được sinh bằng một lần gọi vector hóa. Bể lưu
+    trong file chỉ có đúng một lô và không bao giờ được sinh lại (ghi đè file sẽ làm
+    các tiến trình đang đọc nhận lẫn mẫu của hai lô).
+
+    Luồng ngẫu nhiên được tách theo đơn vị công việc (stream_key, ví dụ chỉ số tác vụ
+    hoặc (epoch, khối liên kết)) qua SeedSequence với spawn_key, không theo worker: một
+    đơn vị công việc luôn nhận cùng các mẫu dù được chạy bởi worker nào, nên kết quả
+    tái lập được bất kể số worker và cách chia việc.
+    """
+    def __init__(self, model=None, pool_size=config.FADING_POOL_SIZE, seed=config.FADING_SEED,
+                 stream_key=0, path=None, mode='w+'):
+        """
+        Args:
+            model (str, optional): 'fixed' hoặc 'lognormal', mặc định config.RAIN_FADING_MODEL.
+            pool_size (int): Số mẫu trong mỗi lô.
+            seed (int): Hạt giống gốc.
+            stream_key (int hoặc tuple of int): Định danh đơn vị công việc, dùng để tách
+                luồng ngẫu nhiên.
+            path (str, optional): Nếu có, bể được lưu trong file .npy memory-mapped
+                thay vì trong RAM.
+            mode (str): Với path: 'w+' tạo (ghi đè) file và sinh ngay pool_size mẫu để
+                các tiến trình khác có thể đọc; 'r' mở một file bể đã có ở chế độ chỉ đọc
+                (khi đó model, pool_size, seed và stream_key không được dùng). Ở cả hai
+                chế độ, các mẫu được lấy lần lượt và lấy quá số mẫu trong file sẽ ném
+                ValueError.
+        """
+        self.model = model or config.RAIN_FADING_MODEL
+        if self.model not in ('fixed', 'lognormal'):
+            raise ValueError(f"Unknown rain fading model '{self.model}'")
+        if mode not in ('w+', 'r'):
+            raise ValueError(f"Unknown fading pool mode '{mode}'")
+        self.file_backed = path is not None
+        self.read_only = self.file_backed and mode == 'r'
+        self.refills = 0
+        if self.read_only:
+            self.rng = None
+            self._pool = np.load(path, mmap_mode='r')
+            self.pool_size = len(self._pool)
+            self._position = 0
+            return
+        self.pool_size = pool_size
+        self.rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=tuple(int(k) for k in np.atleast_1d(stream_key))))
+        self._position = pool_size
+        if path is None:
+            self._pool = np.empty(pool_size)
+        else:
+            self._pool = np.lib.format.open_memmap(path, mode='w+', dtype=np.float64, shape=(pool_size,))
+            self._refill()
+            self._pool.flush()
+
+    def _refill(self):
+        if self.read_only or (self.file_backed and self.refills > 0):
+            raise ValueError(f"File-backed fading pool exhausted after {self.pool_size} samples; "
+                             f"create it with a larger pool_size")
+        if self.model == 'fixed':
+            self._pool[:] = config.RAIN_FADING_DB
+        else:
+            mu, sigma = get_lognormal_parameters(config.RAIN_FADING_MEAN_DB, config.RAIN_FADING_STD_DB)
+            self._pool[:] = self.rng.lognormal(mu, sigma, self.pool_size)
+        self._position = 0
+        self.refills += 1
+
+    def draw(self, shape):
+        """
+        Lấy các mẫu suy hao (dB) với kích thước shape, ví dụ (số bước thời gian, số liên kết).
+        
+        Returns:
+            np.ndarray: Mảng suy hao do mưa (dB).
+        """
+        size = int(np.prod(shape))
+        out = np.empty(size)
+        filled = 0
+        while filled < size:
+            if self._position == self.pool_size:
+                self._refill()
+            take = min(size - filled, self.pool_size - self._position)
+            out[filled:filled + take] = self._pool[self._position:self._position + take]
+            self._position += take
+            filled += take
+        return out.reshape(shape)
+
+def apply_fading(clear_sky_gains, fading_db, out=None):
+    """
+    Áp dụng suy hao do mưa lên mảng độ lợi kênh trời quang (không có suy hao mưa).
+    
+    Args:
+        clear_sky_gains (np.ndarray): Độ lợi kênh (dạng linear), ví dụ tính bằng
+            channel.get_satellite_channel_gain_array(..., rain_fading_db=0).
+        fading_db (np.ndarray): Suy hao do mưa (dB), broadcast được với clear_sky_gains.
+        out (np.ndarray, optional): Mảng ghi kết quả (có thể là chính clear_sky_gains).
+        
+    Returns:
+        np.ndarray: Độ lợi kênh sau khi áp dụng suy hao.
+    """
+    return np.divide(clear_sky_gains, channel.db_to_linear(fading_db), out=out)
+
+if __name__ == '__main__':
+    pool = FadingPool()
+    samples = pool.draw((1000, 5000))
+    print(f"Model '{pool.model}': mean={samples.mean():.3f} dB, std={samples.std():.3f} dB, "
+          f"P(fading > 10 dB)={np.mean(samples > 10):.4f}, refills={pool.refills}")
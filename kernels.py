@@ -0,0 +1,301 @@
+# kernels.py
+
+import numpy as np
+import config
+import channel
+import contract_solver
+
+# Numba là phụ thuộc tùy chọn: nếu không cài, các kernel chạy bằng NumPy thuần.
+try:
+    import numba
+    NUMBA_AVAILABLE = True
+except ImportError:
+    numba = None
+    NUMBA_AVAILABLE = False
+
+AVAILABLE_BACKENDS = ('auto', 'numba', 'numpy')
+
+# =====================================================================
+# KERNEL DẠNG VÒNG LẶP (được biên dịch bởi Numba)
+# Các hằng số trong config được truyền vào làm tham số vì Numba đóng băng
+# biến toàn cục tại thời điểm biên dịch.
+# =====================================================================
+
+def _utility_from_resource_loop(theta, R_mhz, epsilon):
+    out = np.empty(R_mhz.shape[0])
+    for i in range(R_mhz.shape[0]):
+        out[i] = theta[i] * np.log(1 + R_mhz[i] + epsilon)
+    return out
+
+def _agent_utility_loop(R_hz, P, theta, epsilon):
+    out = np.empty(R_hz.shape[0])
+    for i in range(R_hz.shape[0]):
+        r = max(R_hz[i] / 1e6, 0.0)
+        out[i] = theta[i] * np.log(1 + r + epsilon) - P[i]
+    return out
+
+def _principal_utility_loop(R_hz, P, c1, c2):
+    out = np.empty(R_hz.shape[0])
+    for i in range(R_hz.shape[0]):
+        r = max(R_hz[i] / 1e6, 0.0)
+        out[i] = P[i] - (c1 * r + c2 * r * r)
+    return out
+
+def _terrestrial_path_loss_loop(distance_m, a, b, freq_term_db):
+    out = np.empty(distance_m.shape[0])
+    for i in range(distance_m.shape[0]):
+        d = max(distance_m[i], 10.0) # Tránh log(0)
+        out[i] = 10 ** ((a * np.log10(d) + b + freq_term_db) / 10)
+    return out
+
+def _satellite_path_loss_loop(distance_m, lambda_val):
+    out = np.empty(distance_m.shape[0])
+    for i in range(distance_m.shape[0]):
+        out[i] = (4 * np.pi * distance_m[i] / lambda_val)**2
+    return out
+
+def _select_and_accumulate_loop(menu_R_hz, menu_P, thetas, epsilon, c1, c2):
+    # Vòng lặp hợp nhất: mỗi agent chọn hợp đồng tốt nhất (lợi ích > 0, ưu tiên
+    # hợp đồng đứng trước khi bằng nhau) và cộng dồn lợi ích ngay lập tức.
+    num_options = menu_R_hz.shape[0]
+    r = np.empty(num_options)
+    log_term = np.empty(num_options)
+    principal = np.empty(num_options)
+    for k in range(num_options):
+        r[k] = max(menu_R_hz[k] / 1e6, 0.0)
+        log_term[k] = np.log(1 + r[k] + epsilon)
+        principal[k] = menu_P[k] - (c1 * r[k] + c2 * r[k] * r[k])
+
+    chosen = np.full(thetas.shape[0], -1)
+    total_principal = 0.0
+    total_agents = 0.0
+    for i in range(thetas.shape[0]):
+        best_utility = 0.0
+        best_k = -1
+        for k in range(num_options):
+            utility = thetas[i] * log_term[k] - menu_P[k]
+            if utility > best_utility:
+                best_utility = utility
+                best_k = k
+        if best_k >= 0:
+            chosen[i] = best_k
+            total_agents += best_utility
+            total_principal += principal[best_k]
+    return total_principal, total_agents, chosen
+
+# =====================================================================
+# KERNEL NUMPY THUẦN (vector hóa)
+# =====================================================================
+
+def _utility_from_resource_numpy(theta, R_mhz, epsilon):
+    return theta * np.log(1 + R_mhz + epsilon)
+
+def _agent_utility_numpy(R_hz, P, theta, epsilon):
+    return theta * np.log(1 + np.maximum(R_hz / 1e6, 0) + epsilon) - P
+
+def _principal_utility_numpy(R_hz, P, c1, c2):
+    r = np.maximum(R_hz / 1e6, 0)
+    return P - (c1 * r + c2 * r**2)
+
+def _terrestrial_path_loss_numpy(distance_m, a, b, freq_term_db):
+    return 10 ** ((a * np.log10(np.maximum(distance_m, 10.0)) + b + freq_term_db) / 10)
+
+def _satellite_path_loss_numpy(distance_m, lambda_val):
+    return (4 * np.pi * distance_m / lambda_val)**2
+
+def _select_and_accumulate_numpy(menu_R_hz, menu_P, thetas, epsilon, c1, c2):
+    r = np.maximum(menu_R_hz / 1e6, 0)
+    utilities = np.outer(thetas, np.log(1 + r + epsilon)) - menu_P
+    # argmax trả về chỉ số đầu tiên khi bằng nhau, giống vòng lặp tham chiếu
+    best_k = np.argmax(utilities, axis=1)
+    best_utility = utilities[np.arange(len(thetas)), best_k]
+    participates = best_utility > 0
+    chosen = np.where(participates, best_k, -1)
+    principal = menu_P - (c1 * r + c2 * r**2)
+    return (float(principal[best_k[participates]].sum()),
+            float(best_utility[participates].sum()), chosen)
+
+_NUMPY_KERNELS = {
+    'utility_from_resource': _utility_from_resource_numpy,
+    'agent_utility': _agent_utility_numpy,
+    'principal_utility': _principal_utility_numpy,
+    'terrestrial_path_loss': _terrestrial_path_loss_numpy,
+    'satellite_path_loss': _satellite_path_loss_numpy,
+    'select_and_accumulate': _select_and_accumulate_numpy,
+}
+
+_LOOP_KERNELS = {
+    'utility_from_resource': _utility_from_resource_loop,
+    'agent_utility': _agent_utility_loop,
+    'principal_utility': _principal_utility_loop,
+    'terrestrial_path_loss': _terrestrial_path_loss_loop,
+    'satellite_path_loss': _satellite_path_loss_loop,
+    'select_and_accumulate': _select_and_accumulate_loop,
+}
+
+_numba_kernels = None
+_active_backend = None
+_active_kernels = None
+
+def _compile_numba_kernels():
+    global _numba_kernels
+    if _numba_kernels is None:
+        _numba_kernels = {name: numba.njit(cache=True)(fn) for name, fn in _LOOP_KERNELS.items()}
+    return _numba_kernels
+
+def set_backend(backend=None):
+    """
+    Chọn backend cho các kernel: 'numba', 'numpy' hoặc 'auto' (numba nếu đã cài).
+    Mặc định lấy từ config.KERNEL_BACKEND.
+
+    Returns:
+        str: Backend thực sự được dùng ('numba' hoặc 'numpy').
+    """
+    global _active_backend, _active_kernels
+    if backend is None:
+        backend = config.KERNEL_BACKEND
+    if backend not in AVAILABLE_BACKENDS:
+        raise ValueError(f"Unknown kernel backend '{backend}', expected one of {AVAILABLE_BACKENDS}")
+    if backend == 'numba' and not NUMBA_AVAILABLE:
+        raise ImportError("Kernel backend 'numba' requested but numba is not installed")
+
+    if backend == 'numpy' or (backend == 'auto' and not NUMBA_AVAILABLE):
+        _active_backend, _active_kernels = 'numpy', _NUMPY_KERNELS
+    else:
+        _active_backend, _active_kernels = 'numba', _compile_numba_kernels()
+    return _active_backend
+
+def get_backend():
+    """Backend đang được dùng ('numba' hoặc 'numpy')."""
+    if _active_backend is None:
+        set_backend()
+    return _active_backend
+
+def _kernel(name):
+    if _active_kernels is None:
+        set_backend()
+    return _active_kernels[name]
+
+def _as_array(values, size=None):
+    values = np.asarray(values, dtype=np.float64)
+    if size is not None and values.ndim == 0:
+        values = np.full(size, values)
+    return np.ascontiguousarray(values.ravel())
+
+# =====================================================================
+# GIAO DIỆN CÔNG KHAI (đầu vào là mảng, tương đương các hàm tham chiếu)
+# =====================================================================
+
+def utility_from_resource(theta, R_mhz):
+    """Tương đương contract_solver._calculate_utility_from_resource cho mảng."""
+    R_mhz = _as_array(R_mhz)
+    return _kernel('utility_from_resource')(
+        _as_array(theta, R_mhz.size), R_mhz, contract_solver.NUMERICAL_STABILITY_EPSILON)
+
+def agent_utility(R_hz, P, theta):
+    """Tương đương contract_solver.get_agent_utility cho mảng (R theo Hz)."""
+    R_hz = _as_array(R_hz)
+    return _kernel('agent_utility')(
+        R_hz, _as_array(P, R_hz.size), _as_array(theta, R_hz.size),
+        contract_solver.NUMERICAL_STABILITY_EPSILON)
+
+def principal_utility(R_hz, P):
+    """Tương đương contract_solver.get_principal_utility cho mảng (R theo Hz)."""
+    R_hz = _as_array(R_hz)
+    return _kernel('principal_utility')(
+        R_hz, _as_array(P, R_hz.size), config.SAT_COST_C1, config.SAT_COST_C2)
+
+def terrestrial_path_loss(distance_m):
+    """Tương đương channel.get_terrestrial_path_loss cho mảng."""
+    freq_term_db = config.TERRA_PATH_LOSS_C * np.log10(config.TERRESTRIAL_FREQ / 1e9)
+    return _kernel('terrestrial_path_loss')(
+        _as_array(distance_m), config.TERRA_PATH_LOSS_A, config.TERRA_PATH_LOSS_B, freq_term_db)
+
+def satellite_path_loss(distance_m, freq_hz):
+    """Tương đương channel.get_satellite_path_loss cho mảng."""
+    return _kernel('satellite_path_loss')(_as_array(distance_m), config.SPEED_OF_LIGHT / freq_hz)
+
+def select_and_accumulate(contract_menu, thetas):
+    """
+    Vòng lặp hợp nhất chọn hợp đồng + cộng dồn lợi ích cho nhiều agent, tương đương
+    contract_solver.select_contract kết hợp get_agent_utility / get_principal_utility.
+
+    Args:
+        contract_menu (dict): Menu hợp đồng {tên type: Contract}.
+        thetas (array-like): theta thực của từng agent.
+
+    Returns:
+        tuple: (tổng lợi ích Principal, tổng lợi ích Agents, chỉ số hợp đồng được chọn
+                của mỗi agent trong menu, -1 nếu không tham gia).
+    """
+    contracts = list(contract_menu.values())
+    menu_R_hz = _as_array([c.R for c in contracts])
+    menu_P = _as_array([c.P for c in contracts])
+    return _kernel('select_and_accumulate')(
+        menu_R_hz, menu_P, _as_array(thetas), contract_solver.NUMERICAL_STABILITY_EPSILON,
+        config.SAT_COST_C1, config.SAT_COST_C2)
+
+def verify_parity(num_samples=1000, seed=0, rtol=1e-9):
+    """
+    So sánh các kernel của backend đang dùng với các hàm tham chiếu (vô hướng)
+    trong contract_solver và channel.
+
+    Returns:
+        dict: Sai số tương đối lớn nhất của từng kernel; ném AssertionError nếu vượt rtol.
+    """
+    rng = np.random.default_rng(seed)
+    thetas = rng.uniform(1, 15, num_samples)
+    R_hz = rng.uniform(-5e6, 120e6, num_samples)
+    P = rng.uniform(0, 60, num_samples)
+    distances = rng.uniform(0, 2e6, num_samples)
+    contract_menu = contract_solver.design_optimal_contracts()
+
+    def max_rel_error(actual, expected):
+        expected = np.asarray(expected, dtype=float)
+        return float(np.max(np.abs(actual - expected) / np.maximum(np.abs(expected), 1e-300)))
+
+    contracts = [contract_solver.Contract(R, p) for R, p in zip(R_hz, P)]
+    errors = {
+        'utility_from_resource': max_rel_error(
+            utility_from_resource(thetas, np.maximum(R_hz / 1e6, 0)),
+            [contract_solver._calculate_utility_from_resource(t, max(r / 1e6, 0)) for t, r in zip(thetas, R_hz)]),
+        'agent_utility': max_rel_error(
+            agent_utility(R_hz, P, thetas),
+            [contract_solver.get_agent_utility(c, t) for c, t in zip(contracts, thetas)]),
+        'principal_utility': max_rel_error(
+            principal_utility(R_hz, P),
+            [contract_solver.get_principal_utility(c, t) for c, t in zip(contracts, thetas)]),
+        'terrestrial_path_loss': max_rel_error(
+            terrestrial_path_loss(distances),
+            [channel.get_terrestrial_path_loss(d) for d in distances]),
+        'satellite_path_loss': max_rel_error(
+            satellite_path_loss(distances, config.SAT_DOWNLINK_FREQ),
+            [channel.get_satellite_path_loss(d, config.SAT_DOWNLINK_FREQ) for d in distances]),
+    }
+
+    # Vòng lặp tham chiếu của main.py cho bước chọn hợp đồng + cộng dồn
+    expected_principal, expected_agents, expected_chosen = 0.0, 0.0, []
+    for theta in thetas:
+        chosen_contract, best_utility = contract_solver.select_contract(contract_menu, theta)
+        if chosen_contract:
+            expected_agents += best_utility
+            expected_principal += contract_solver.get_principal_utility(chosen_contract, theta)
+            expected_chosen.append([c is chosen_contract for c in contract_menu.values()].index(True))
+        else:
+            expected_chosen.append(-1)
+    total_principal, total_agents, chosen = select_and_accumulate(contract_menu, thetas)
+    if not np.array_equal(chosen, expected_chosen):
+        raise AssertionError("select_and_accumulate chose different contracts than the reference loop")
+    errors['select_and_accumulate'] = max(max_rel_error(np.array([total_principal]), [expected_principal]),
+                                          max_rel_error(np.array([total_agents]), [expected_agents]))
+
+    for name, error in errors.items():
+        if error > rtol:
+            raise AssertionError(f"Kernel '{name}' ({get_backend()} backend) deviates from reference: "
+                                 f"max relative error {error:.3e} > {rtol:.0e}")
+    return errors
+
+if __name__ == '__main__':
+    for backend in ('numpy', 'numba') if NUMBA_AVAILABLE else ('numpy',):
+        set_backend(backend)
+        print(f"Backend '{backend}': parity OK, max relative errors = {verify_parity()}")
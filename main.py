@@ -11,15 +11,23 @@ import geometry
 import channel
 import contract_solver
 import baselines # Import module mới
+import robust_solver
+import kernels
+import agent_type_pipeline
 
-def run_simulation_for_one_scenario(scenario_name, num_agents):
+def run_simulation_for_one_scenario(scenario_name, num_agents, agent_types=None):
     """
     Hàm này chạy mô phỏng cho MỘT kịch bản (ví dụ: 'Contract Theory' hoặc 'Centralized').
+    agent_types là bảng type (mặc định config.AGENT_TYPES), ví dụ bảng sinh từ kênh
+    truyền bởi agent_type_pipeline.
     Trả về tổng lợi ích của Principal và Agents.
     """
+    if agent_types is None:
+        agent_types = config.AGENT_TYPES
+
     # Gán ngẫu nhiên type cho các agent
-    agent_types_list = list(config.AGENT_TYPES.keys())
-    agent_type_probs = [config.AGENT_TYPES[t]['prob'] for t in agent_types_list]
+    agent_types_list = list(agent_types.keys())
+    agent_type_probs = [agent_types[t]['prob'] for t in agent_types_list]
     assigned_types = np.random.choice(agent_types_list, size=num_agents, p=agent_type_probs)
 
     total_principal_utility = 0
@@ -27,36 +35,23 @@ def run_simulation_for_one_scenario(scenario_name, num_agents):
     
     # Phân bổ tài nguyên dựa trên kịch bản
     if scenario_name == 'Contract Theory':
-        contract_menu = contract_solver.design_optimal_contracts()
+        contract_menu = contract_solver.design_optimal_contracts(agent_types, robust=config.ROBUST_SOLVE)
         if not contract_menu: return None, None
         
-        for i in range(num_agents):
-            my_true_type_name = assigned_types[i]
-            my_true_theta = config.AGENT_TYPES[my_true_type_name]['theta']
-            
-            # Agent lựa chọn hợp đồng
-            best_utility = 0.0
-            chosen_contract = None
-            for _, contract_option in contract_menu.items():
-                utility = contract_solver.get_agent_utility(contract_option, my_true_theta)
-                if utility > best_utility:
-                    best_utility = utility
-                    chosen_contract = contract_option
-            
-            if chosen_contract:
-                total_agents_utility += best_utility
-                total_principal_utility += contract_solver.get_principal_utility(chosen_contract, my_true_theta)
+        # Các agent lựa chọn hợp đồng và cộng dồn lợi ích trong một kernel hợp nhất
+        true_thetas = [agent_types[t]['theta'] for t in assigned_types]
+        total_principal_utility, total_agents_utility, _ = kernels.select_and_accumulate(contract_menu, true_thetas)
 
     elif scenario_name == 'Centralized':
-        R_l_opt, R_h_opt = baselines.solve_centralized_optimal()
-        if R_l_opt is None: return None, None
+        R_opt = dict(zip(agent_types_list, baselines.solve_centralized_optimal(agent_types, robust=config.ROBUST_SOLVE)))
+        if any(R is None for R in R_opt.values()): return None, None
         
         # Phân bổ tài nguyên và tính lợi ích
         for i in range(num_agents):
             my_true_type_name = assigned_types[i]
-            my_true_theta = config.AGENT_TYPES[my_true_type_name]['theta']
+            my_true_theta = agent_types[my_true_type_name]['theta']
             
-            R_alloc = R_l_opt if my_true_type_name == 'low_efficiency' else R_h_opt
+            R_alloc = R_opt[my_true_type_name]
             
             # Trong kịch bản tập trung, không có thanh toán (P=0). 
             # Lợi ích của agent chính là lợi ích từ tài nguyên.
@@ -76,7 +71,7 @@ def run_simulation_for_one_scenario(scenario_name, num_agents):
         
         for i in range(num_agents):
             my_true_type_name = assigned_types[i]
-            my_true_theta = config.AGENT_TYPES[my_true_type_name]['theta']
+            my_true_theta = agent_types[my_true_type_name]['theta']
             
             temp_contract = contract_solver.Contract(resource=R_alloc * 1e6, payment=0)
             agent_benefit = contract_solver.get_agent_utility(temp_contract, my_true_theta)
@@ -119,41 +114,73 @@ def plot_results(df):
     print(f"Performance comparison plot saved to '{filepath}'")
 
 
+# --- Thiết lập Mô phỏng ---
+NUM_SIMULATION_RUNS = 20 # Chạy 20 lần cho mỗi điểm dữ liệu để lấy trung bình
+NUM_TOS_RANGE = [5, 10, 15, 20, 25, 30] # Khảo sát số lượng TOs
+SCENARIOS_TO_RUN = ['Contract Theory', 'Centralized', 'Equal Allocation']
+RESULTS_CSV_PATH = os.path.join('results', 'simulation_results.csv')
+
+def get_agent_types():
+    """Bảng type: nhập tay trong config hoặc sinh từ vị trí triển khai và kênh truyền."""
+    if config.USE_CHANNEL_DERIVED_TYPES:
+        return agent_type_pipeline.build_agent_type_table()
+    return config.AGENT_TYPES
+
+def run_repeated_simulations(scenario_name, num_agents, num_runs, agent_types=None):
+    """
+    Chạy num_runs lần mô phỏng cho một ô (kịch bản, số TO).
+    Trả về danh sách lợi ích của Principal và Agents của các lần chạy thành công.
+    """
+    run_principal_utils = []
+    run_agents_utils = []
+    for _ in range(num_runs):
+        p_util, a_util = run_simulation_for_one_scenario(scenario_name, num_agents, agent_types)
+        if p_util is not None:
+            run_principal_utils.append(float(p_util))
+            run_agents_utils.append(float(a_util))
+    return run_principal_utils, run_agents_utils
+
+def summarize_runs(scenario_name, num_agents, run_principal_utils, run_agents_utils):
+    """
+    Tính giá trị trung bình của các lần chạy thành công thành một dòng kết quả.
+    Nếu không có lần chạy nào thành công, các giá trị trung bình là NaN (không phải 0).
+    """
+    avg_p_util = np.mean(run_principal_utils) if run_principal_utils else np.nan
+    avg_a_util = np.mean(run_agents_utils) if run_agents_utils else np.nan
+    return {
+        'Scenario': scenario_name,
+        'Num TOs': num_agents,
+        'Principal Utility': avg_p_util,
+        'Agents Utility': avg_a_util,
+        'Social Welfare': avg_p_util + avg_a_util,
+        'Valid Runs': len(run_principal_utils)
+    }
+
+
 if __name__ == '__main__':
-    # --- Thiết lập Mô phỏng ---
-    num_simulation_runs = 20 # Chạy 20 lần cho mỗi điểm dữ liệu để lấy trung bình
-    num_tos_range = [5, 10, 15, 20, 25, 30] # Khảo sát số lượng TOs
-    scenarios_to_run = ['Contract Theory', 'Centralized', 'Equal Allocation']
+    agent_types = get_agent_types()
+    if config.USE_CHANNEL_DERIVED_TYPES:
+        print(f"Using channel-derived agent types: {agent_types}")
     
     all_results = []
     
     # --- Vòng lặp Mô phỏng chính ---
-    for n_tos in num_tos_range:
+    for n_tos in NUM_TOS_RANGE:
         print(f"\n--- Running simulations for {n_tos} TOs ---")
-        for scenario in scenarios_to_run:
+        for scenario in SCENARIOS_TO_RUN:
             # Lưu kết quả của từng lần chạy để tính trung bình và độ lệch chuẩn
-            run_principal_utils = []
-            run_agents_utils = []
-            
-            for _ in range(num_simulation_runs):
-                p_util, a_util = run_simulation_for_one_scenario(scenario, n_tos)
-                if p_util is not None:
-                    run_principal_utils.append(p_util)
-                    run_agents_utils.append(a_util)
-            
-            # Tính giá trị trung bình
-            avg_p_util = np.mean(run_principal_utils) if run_principal_utils else 0
-            avg_a_util = np.mean(run_agents_utils) if run_agents_utils else 0
+            run_principal_utils, run_agents_utils = run_repeated_simulations(
+                scenario, n_tos, NUM_SIMULATION_RUNS, agent_types)
             
             # Lưu kết quả
-            all_results.append({
-                'Scenario': scenario,
-                'Num TOs': n_tos,
-                'Principal Utility': avg_p_util,
-                'Agents Utility': avg_a_util,
-                'Social Welfare': avg_p_util + avg_a_util
-            })
-            print(f"  - Scenario '{scenario}': Social Welfare = {avg_p_util + avg_a_util:.2f}")
+            row = summarize_runs(scenario, n_tos, run_principal_utils, run_agents_utils)
+            all_results.append(row)
+            if row['Valid Runs'] < NUM_SIMULATION_RUNS:
+                print(f"  ! Scenario '{scenario}': only {row['Valid Runs']}/{NUM_SIMULATION_RUNS} runs succeeded")
+            print(f"  - Scenario '{scenario}': Social Welfare = {row['Social Welfare']:.2f}")
+
+    if config.ROBUST_SOLVE:
+        print(f"\nRobust solver statistics: {robust_solver.SOLVE_STATS}")
 
     # --- Xử lý và Trực quan hóa Kết quả ---
     results_df = pd.DataFrame(all_results)
@@ -161,8 +188,8 @@ if __name__ == '__main__':
     print(results_df)
     
     # Lưu kết quả ra file CSV
-    results_df.to_csv('results/simulation_results.csv', index=False)
-    print("\nResults saved to 'results/simulation_results.csv'")
+    results_df.to_csv(RESULTS_CSV_PATH, index=False)
+    print(f"\nResults saved to '{RESULTS_CSV_PATH}'")
     
     # Vẽ đồ thị
     plot_results(results_df)
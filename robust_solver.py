@@ -0,0 +1,174 @@
+# robust_solver.py
+
+import atexit
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import config
+from scipy.optimize import minimize
+
+FEASIBILITY_TOLERANCE = 1e-7
+
+class SolveStats:
+    """Thống kê số lần giải, số điểm khởi tạo thất bại và số lần phải dùng phương án dự phòng."""
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.solves = 0             # Số bài toán đã giải
+        self.starts = 0             # Tổng số điểm khởi tạo đã chạy
+        self.failed_starts = 0      # Số điểm khởi tạo thất bại hoặc cho nghiệm không khả thi
+        self.primary_failures = 0   # Số bài toán mà điểm khởi tạo mặc định thất bại
+        self.fallback_solves = 0    # Số bài toán phải dùng phương án dự phòng
+        self.failures = 0           # Số bài toán thất bại hoàn toàn
+
+    def summary(self):
+        return {'solves': self.solves, 'starts': self.starts, 'failed_starts': self.failed_starts,
+                'primary_failures': self.primary_failures, 'fallback_solves': self.fallback_solves,
+                'failures': self.failures}
+
+    def __repr__(self):
+        return "SolveStats(" + ", ".join(f"{k}={v}" for k, v in self.summary().items()) + ")"
+
+# Thống kê dùng chung cho toàn bộ các lần giải ở chế độ robust
+SOLVE_STATS = SolveStats()
+
+def is_feasible(x, bounds, constraints, tol=FEASIBILITY_TOLERANCE):
+    """
+    Kiểm tra nghiệm x có thỏa mãn các cận và ràng buộc bất đẳng thức (>= 0) hay không.
+    Các ràng buộc dạng dict có thể kèm 'args' như trong scipy.optimize.minimize.
+    """
+    x = np.asarray(x, dtype=float)
+    if not np.all(np.isfinite(x)):
+        return False
+    for value, (lower, upper) in zip(x, bounds):
+        if lower is not None and value < lower - tol:
+            return False
+        if upper is not None and value > upper + tol:
+            return False
+    return all(c['fun'](x, *c.get('args', ())) >= -tol for c in constraints)
+
+def generate_starting_points(initial_guess, bounds, num_starts, rng):
+    """
+    Sinh num_starts điểm khởi tạo: điểm mặc định và các điểm ngẫu nhiên.
+    Biến có cận dưới (tài nguyên R, MHz) được rút đều trong [0, tổng tài nguyên];
+    biến tự do (thanh toán P) được rút quanh giá trị mặc định.
+    """
+    initial_guess = np.asarray(initial_guess, dtype=float)
+    total_resource_mhz = config.TOTAL_SAT_RESOURCE_B_HZ / 1e6
+    starts = [initial_guess]
+    for _ in range(num_starts - 1):
+        start = np.empty_like(initial_guess)
+        for i, (lower, upper) in enumerate(bounds):
+            if lower is not None:
+                start[i] = rng.uniform(lower, upper if upper is not None else lower + total_resource_mhz)
+            else:
+                start[i] = initial_guess[i] + rng.normal(0, 1 + abs(initial_guess[i]))
+        starts.append(start)
+    return starts
+
+# Process pool dùng chung cho mọi lần giải, tạo khi cần lần đầu để không phải trả chi
+# phí khởi động process ở mỗi bài toán
+_EXECUTOR = None
+_EXECUTOR_WORKERS = 0
+
+def get_executor(max_workers):
+    """Process pool dùng chung với max_workers process (tạo lại nếu số process thay đổi)."""
+    global _EXECUTOR, _EXECUTOR_WORKERS
+    if _EXECUTOR is None or _EXECUTOR_WORKERS != max_workers:
+        shutdown_executor()
+        _EXECUTOR = ProcessPoolExecutor(max_workers=max_workers)
+        _EXECUTOR_WORKERS = max_workers
+    return _EXECUTOR
+
+def shutdown_executor():
+    """Đóng process pool dùng chung (nếu có)."""
+    global _EXECUTOR, _EXECUTOR_WORKERS
+    if _EXECUTOR is not None:
+        _EXECUTOR.shutdown()
+        _EXECUTOR, _EXECUTOR_WORKERS = None, 0
+
+atexit.register(shutdown_executor)
+
+def _solve_from(start, objective_function, args, bounds, constraints, options):
+    return minimize(objective_function, start, args=args, method='SLSQP', bounds=bounds,
+                    constraints=constraints, options=options)
+
+def robust_minimize(objective_function, initial_guess, bounds, constraints=(), options=None,
+                    args=(), analytic_fallback=None, num_starts=None, max_workers=None, seed=None,
+                    stats=SOLVE_STATS, executor=None):
+    """
+    Giải bài toán tối ưu từ nhiều điểm khởi tạo (SLSQP) và lấy nghiệm khả thi tốt nhất.
+    Nếu mọi điểm khởi tạo đều thất bại, thử lần lượt:
+    (1) trust-constr từ điểm khởi tạo mặc định, (2) nghiệm giải tích analytic_fallback.
+
+    Với max_workers > 1, các điểm khởi tạo chạy đồng thời trên một process pool dùng
+    chung giữa các lần giải (SLSQP giữ GIL nên thread pool không nhanh hơn chạy tuần
+    tự); khi đó hàm mục tiêu và ràng buộc phải là hàm ở mức module, nhận tham số qua
+    args, để pickle được.
+
+    Args:
+        objective_function (callable): Hàm mục tiêu cần cực tiểu hóa.
+        initial_guess (array-like): Điểm khởi tạo mặc định.
+        bounds (list): Cận của từng biến, như trong scipy.optimize.minimize.
+        constraints (list): Các ràng buộc 'ineq' dạng dict.
+        options (dict, optional): Tùy chọn cho SLSQP.
+        args (tuple): Tham số bổ sung cho hàm mục tiêu.
+        analytic_fallback (callable, optional): Hàm không tham số trả về nghiệm x dự phòng.
+        num_starts (int, optional): Số điểm khởi tạo, mặc định config.ROBUST_SOLVE_NUM_STARTS.
+        max_workers (int, optional): Số process, mặc định config.ROBUST_SOLVE_MAX_WORKERS.
+        seed (int, optional): Hạt giống để sinh các điểm khởi tạo.
+        stats (SolveStats): Nơi ghi nhận thống kê.
+        executor (concurrent.futures.Executor, optional): Pool dùng để chạy các điểm khởi
+            tạo; mặc định là process pool dùng chung (get_executor), chạy tuần tự nếu
+            max_workers = 1.
+
+    Returns:
+        tuple: (x, method) với method là 'SLSQP', 'trust-constr' hoặc 'analytic';
+               (None, None) nếu mọi phương án đều thất bại.
+    """
+    if num_starts is None:
+        num_starts = config.ROBUST_SOLVE_NUM_STARTS
+    if max_workers is None:
+        max_workers = config.ROBUST_SOLVE_MAX_WORKERS
+    if options is None:
+        options = {'maxiter': 1000, 'ftol': 1e-9}
+    constraints = list(constraints)
+    stats.solves += 1
+
+    starts = generate_starting_points(initial_guess, bounds, num_starts, np.random.default_rng(seed))
+    if executor is None and max_workers > 1:
+        executor = get_executor(max_workers)
+    if executor is not None:
+        futures = [executor.submit(_solve_from, start, objective_function, args, bounds,
+                                   constraints, options) for start in starts]
+        results = [future.result() for future in futures]
+    else:
+        results = [_solve_from(start, objective_function, args, bounds, constraints, options)
+                   for start in starts]
+
+    best_x, best_fun = None, np.inf
+    for i, result in enumerate(results):
+        stats.starts += 1
+        if result.success and is_feasible(result.x, bounds, constraints):
+            if result.fun < best_fun:
+                best_x, best_fun = result.x, result.fun
+        else:
+            stats.failed_starts += 1
+            if i == 0:
+                stats.primary_failures += 1
+    if best_x is not None:
+        return best_x, 'SLSQP'
+
+    stats.fallback_solves += 1
+    result = minimize(objective_function, initial_guess, args=args, method='trust-constr', bounds=bounds,
+                      constraints=constraints, options={'maxiter': 5000})
+    if result.success and is_feasible(result.x, bounds, constraints):
+        return result.x, 'trust-constr'
+
+    if analytic_fallback is not None:
+        x = analytic_fallback()
+        if x is not None and is_feasible(x, bounds, constraints):
+            return np.asarray(x, dtype=float), 'analytic'
+
+    stats.failures += 1
+    return None, None
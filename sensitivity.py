@@ -0,0 +1,446 @@
+# sensitivity.py
+#
+# Độ nhạy (đạo hàm chính xác) của nghiệm tối ưu theo các tham số trong config,
+# tính bằng định lý hàm ẩn trên hệ KKT của các ràng buộc đang chặt (active):
+#
+#   [ H   -J^T ] [ dx/dp  ]     [ d(grad_x L)/dp ]
+#   [ J    0   ] [ dmu/dp ] = - [ d(g_A)/dp      ]
+#
+# với L = F - mu^T g_A (bài toán min F, g >= 0). Toàn bộ Jacobian theo mọi tham số
+# chỉ cần một lần giải hệ KKT (mọi tham số là các cột vế phải), cộng với một bài toán
+# bình phương tối thiểu nhỏ cho mu và một phép kiểm tra hạng cho mỗi ràng buộc gần chặt,
+# thay vì 2 x (số tham số) lần giải lại bài toán. Jacobian đúng tại điểm được cho, nhưng
+# nghiệm SLSQP chỉ chính xác cỡ sqrt(ftol) nên mặc định (refine=False) các phần tử lệch
+# tới cỡ 1e-3 tương đối so với đạo hàm đúng (8e-4 với config mặc định). Tùy chọn
+# refine=True làm chính xác nghiệm bằng Newton trước (thêm tối đa NEWTON_MAX_ITERATIONS
+# lần giải hệ KKT) và cho sai số cỡ 1e-6.
+#
+# Các tham số: theta và prob của từng type (mỗi prob được xem là độc lập, không chuẩn
+# hóa lại tổng), SAT_COST_C1 và SAT_COST_C2.
+
+import numpy as np
+import pandas as pd
+import config
+import contract_solver
+import baselines
+
+ACTIVE_CONSTRAINT_TOLERANCE = 1e-7
+NEWTON_TOLERANCE = 1e-14
+NEWTON_MAX_ITERATIONS = 50
+
+class _KKTProblem:
+    """
+    Bài toán min F(x, p) với ràng buộc g(x, p) >= 0. Lớp con cung cấp đạo hàm giải tích
+    bậc một và bậc hai của hàm mục tiêu, ràng buộc và các đại lượng đầu ra.
+    """
+    def __init__(self, agent_types):
+        self.type_names = list(agent_types.keys())
+        self.thetas = np.array([agent_types[t]['theta'] for t in self.type_names], dtype=float)
+        self.probs = np.array([agent_types[t]['prob'] for t in self.type_names], dtype=float)
+        self.c1 = config.SAT_COST_C1
+        self.c2 = config.SAT_COST_C2
+        self.num_types = len(self.type_names)
+        self.parameter_names = ([f"theta[{t}]" for t in self.type_names] +
+                                [f"prob[{t}]" for t in self.type_names] +
+                                ['SAT_COST_C1', 'SAT_COST_C2'])
+
+    # Chỉ số cột của từng tham số
+    def _theta_col(self, k):
+        return k
+
+    def _prob_col(self, k):
+        return self.num_types + k
+
+    def _c1_col(self):
+        return 2 * self.num_types
+
+    def _c2_col(self):
+        return 2 * self.num_types + 1
+
+    def select_active_set(self, x, tol=ACTIVE_CONSTRAINT_TOLERANCE):
+        """
+        Các ràng buộc chặt có gradient độc lập tuyến tính (loại bỏ ràng buộc phụ thuộc
+        để hệ KKT không suy biến), ưu tiên ràng buộc chặt hơn.
+        """
+        values = self.constraint_values(x)
+        jacobian = self.constraint_jacobian(x)
+        active = []
+        for i in sorted(np.flatnonzero(np.abs(values) <= tol), key=lambda i: abs(values[i])):
+            if np.linalg.matrix_rank(jacobian[active + [i]]) == len(active) + 1:
+                active.append(i)
+        return np.array(active, dtype=int)
+
+    def _kkt_matrix(self, x, active, mu):
+        full_mu = np.zeros(len(self.constraint_values(x)))
+        full_mu[active] = mu
+        hessian = self.objective_hessian(x) - self.constraint_weighted_hessian(x, full_mu)
+        jacobian = self.constraint_jacobian(x)[active]
+        m = len(active)
+        return np.block([[hessian, -jacobian.T], [jacobian, np.zeros((m, m))]]), full_mu
+
+    def refine(self, x, active):
+        """
+        Làm chính xác nghiệm (x, mu) bằng phương pháp Newton trên hệ KKT với tập ràng buộc
+        chặt cố định (nghiệm SLSQP chỉ chính xác cỡ sqrt(ftol)).
+        """
+        x = np.array(x, dtype=float)
+        mu = self.multipliers(x, active)
+        for _ in range(NEWTON_MAX_ITERATIONS):
+            residual = np.concatenate((
+                self.objective_gradient(x) - self.constraint_jacobian(x)[active].T @ mu,
+                self.constraint_values(x)[active]))
+            kkt_matrix, _ = self._kkt_matrix(x, active, mu)
+            step = np.linalg.solve(kkt_matrix, -residual)
+            x += step[:len(x)]
+            mu += step[len(x):]
+            # Dừng theo độ lớn bước: Hessian có thể rất nhỏ nên phần dư nhỏ chưa đủ
+            if np.max(np.abs(step[:len(x)])) <= NEWTON_TOLERANCE * (1 + np.max(np.abs(x))):
+                break
+        return x, mu
+
+    def multipliers(self, x, active):
+        """Nhân tử mu của các ràng buộc chặt từ điều kiện dừng grad F = J_A^T mu (bình phương tối thiểu)."""
+        return np.linalg.lstsq(self.constraint_jacobian(x)[active].T, self.objective_gradient(x), rcond=None)[0]
+
+    def sensitivities(self, x, refine=False):
+        """
+        Jacobian của các đại lượng đầu ra theo các tham số tại nghiệm x.
+        Với refine=True, nghiệm x được làm chính xác bằng Newton trước khi tính; nếu không,
+        độ chính xác bị giới hạn bởi độ chính xác của x (cỡ 1e-3 tương đối với nghiệm SLSQP).
+
+        Returns:
+            tuple: (giá trị đầu ra, Jacobian (số đầu ra x số tham số)).
+        """
+        active = self.select_active_set(x)
+        if refine:
+            x, mu = self.refine(x, active)
+        else:
+            x = np.asarray(x, dtype=float)
+            mu = self.multipliers(x, active)
+        kkt_matrix, full_mu = self._kkt_matrix(x, active, mu)
+        rhs = -np.vstack((
+            self.objective_gradient_param(x) - self.constraint_weighted_jacobian_param(x, full_mu),
+            self.constraint_param(x)[active]))
+        # Một lần giải hệ tuyến tính cho mọi tham số (mỗi tham số là một cột vế phải)
+        solution = np.linalg.solve(kkt_matrix, rhs)
+        dx_dp = solution[:len(x)]
+        values, grad_x, grad_p = self.outputs(x)
+        return values, grad_p + grad_x @ dx_dp
+
+    def to_frame(self, values, jacobian):
+        frame = pd.DataFrame(jacobian, index=self.output_names, columns=self.parameter_names)
+        frame.insert(0, 'Value', values)
+        return frame
+
+class ContractKKT(_KKTProblem):
+    """
+    Bài toán thiết kế hợp đồng của contract_solver.design_optimal_contracts.
+    x = [R_1, P_1, ..., R_K, P_K] (R tính theo MHz).
+    """
+    def __init__(self, agent_types):
+        super().__init__(agent_types)
+        K = self.num_types
+        # Ràng buộc (theta_k, chỉ số type a, chỉ số type b hoặc None, khoảng đệm):
+        # g = theta_k * (u(R_a) - u(R_b)) - P_a + P_b - margin, cùng thứ tự với solver
+        self.incentive_constraints = [(k, k, None, 0.0) for k in range(K)]
+        self.incentive_constraints += [
+            (k, k, j, contract_solver.IC_SAFETY_MARGIN if self.thetas[k] > self.thetas[j] else 0.0)
+            for k in range(K) for j in range(K) if j != k]
+        self.output_names = ([f"R[{t}] (MHz)" for t in self.type_names] +
+                             [f"P[{t}]" for t in self.type_names] +
+                             ['Principal Utility', 'Agents Utility', 'Social Welfare'])
+
+    @staticmethod
+    def _u(R):
+        return np.log(1 + R + contract_solver.NUMERICAL_STABILITY_EPSILON)
+
+    @staticmethod
+    def _du(R):
+        return 1 / (1 + R + contract_solver.NUMERICAL_STABILITY_EPSILON)
+
+    @staticmethod
+    def _d2u(R):
+        return -1 / (1 + R + contract_solver.NUMERICAL_STABILITY_EPSILON)**2
+
+    def _num_constraints(self):
+        # Ràng buộc hợp đồng + cận R_k >= 0
+        return len(self.incentive_constraints) + self.num_types
+
+    def constraint_values(self, x):
+        values = np.empty(self._num_constraints())
+        for i, (k, a, b, margin) in enumerate(self.incentive_constraints):
+            values[i] = self.thetas[k] * self._u(x[2*a]) - x[2*a + 1] - margin
+            if b is not None:
+                values[i] -= self.thetas[k] * self._u(x[2*b]) - x[2*b + 1]
+        values[len(self.incentive_constraints):] = x[0::2]
+        return values
+
+    def constraint_jacobian(self, x):
+        jacobian = np.zeros((self._num_constraints(), len(x)))
+        for i, (k, a, b, _) in enumerate(self.incentive_constraints):
+            jacobian[i, 2*a] += self.thetas[k] * self._du(x[2*a])
+            jacobian[i, 2*a + 1] -= 1
+            if b is not None:
+                jacobian[i, 2*b] -= self.thetas[k] * self._du(x[2*b])
+                jacobian[i, 2*b + 1] += 1
+        for k in range(self.num_types):
+            jacobian[len(self.incentive_constraints) + k, 2*k] = 1
+        return jacobian
+
+    def constraint_weighted_hessian(self, x, mu):
+        hessian = np.zeros((len(x), len(x)))
+        for i, (k, a, b, _) in enumerate(self.incentive_constraints):
+            hessian[2*a, 2*a] += mu[i] * self.thetas[k] * self._d2u(x[2*a])
+            if b is not None:
+                hessian[2*b, 2*b] -= mu[i] * self.thetas[k] * self._d2u(x[2*b])
+        return hessian
+
+    def constraint_param(self, x):
+        derivative = np.zeros((self._num_constraints(), len(self.parameter_names)))
+        for i, (k, a, b, _) in enumerate(self.incentive_constraints):
+            derivative[i, self._theta_col(k)] = self._u(x[2*a]) - (self._u(x[2*b]) if b is not None else 0)
+        return derivative
+
+    def constraint_weighted_jacobian_param(self, x, mu):
+        derivative = np.zeros((len(x), len(self.parameter_names)))
+        for i, (k, a, b, _) in enumerate(self.incentive_constraints):
+            derivative[2*a, self._theta_col(k)] += mu[i] * self._du(x[2*a])
+            if b is not None:
+                derivative[2*b, self._theta_col(k)] -= mu[i] * self._du(x[2*b])
+        return derivative
+
+    # Hàm mục tiêu F = -sum_k prob_k * (P_k - c1*R_k - c2*R_k^2)
+    def objective_gradient(self, x):
+        gradient = np.empty(len(x))
+        gradient[0::2] = self.probs * (self.c1 + 2 * self.c2 * x[0::2])
+        gradient[1::2] = -self.probs
+        return gradient
+
+    def objective_hessian(self, x):
+        hessian = np.zeros((len(x), len(x)))
+        hessian[np.arange(0, len(x), 2), np.arange(0, len(x), 2)] = 2 * self.c2 * self.probs
+        return hessian
+
+    def objective_gradient_param(self, x):
+        derivative = np.zeros((len(x), len(self.parameter_names)))
+        for k in range(self.num_types):
+            derivative[2*k, self._prob_col(k)] = self.c1 + 2 * self.c2 * x[2*k]
+            derivative[2*k + 1, self._prob_col(k)] = -1
+            derivative[2*k, self._c1_col()] = self.probs[k]
+            derivative[2*k, self._c2_col()] = 2 * self.probs[k] * x[2*k]
+        return derivative
+
+    def outputs(self, x):
+        K = self.num_types
+        R, P = x[0::2], x[1::2]
+        principal = self.probs * (P - self.c1 * R - self.c2 * R**2)
+        agents = self.probs * (self.thetas * self._u(R) - P)
+        values = np.concatenate((R, P, [principal.sum(), agents.sum(), principal.sum() + agents.sum()]))
+
+        grad_x = np.zeros((2*K + 3, 2*K))
+        grad_p = np.zeros((2*K + 3, len(self.parameter_names)))
+        for k in range(K):
+            grad_x[k, 2*k] = 1
+            grad_x[K + k, 2*k + 1] = 1
+            # Principal
+            grad_x[2*K, 2*k] = -self.probs[k] * (self.c1 + 2 * self.c2 * R[k])
+            grad_x[2*K, 2*k + 1] = self.probs[k]
+            grad_p[2*K, self._prob_col(k)] = P[k] - self.c1 * R[k] - self.c2 * R[k]**2
+            # Agents
+            grad_x[2*K + 1, 2*k] = self.probs[k] * self.thetas[k] * self._du(R[k])
+            grad_x[2*K + 1, 2*k + 1] = -self.probs[k]
+            grad_p[2*K + 1, self._theta_col(k)] = self.probs[k] * self._u(R[k])
+            grad_p[2*K + 1, self._prob_col(k)] = self.thetas[k] * self._u(R[k]) - P[k]
+        grad_p[2*K, self._c1_col()] = -np.dot(self.probs, R)
+        grad_p[2*K, self._c2_col()] = -np.dot(self.probs, R**2)
+        grad_x[2*K + 2] = grad_x[2*K] + grad_x[2*K + 1]
+        grad_p[2*K + 2] = grad_p[2*K] + grad_p[2*K + 1]
+        return values, grad_x, grad_p
+
+    def solution_from_menu(self, contract_menu):
+        x = np.empty(2 * self.num_types)
+        for k, name in enumerate(self.type_names):
+            x[2*k] = contract_menu[name].R / 1e6
+            x[2*k + 1] = contract_menu[name].P
+        return x
+
+class CentralizedKKT(_KKTProblem):
+    """
+    Bài toán của Social Planner trong baselines.solve_centralized_optimal.
+    x = [R_1, ..., R_K] (MHz); ràng buộc duy nhất là R_k >= 0.
+    """
+    def __init__(self, agent_types):
+        super().__init__(agent_types)
+        self.output_names = ([f"R[{t}] (MHz)" for t in self.type_names] +
+                             ['Principal Utility', 'Agents Utility', 'Social Welfare'])
+
+    def constraint_values(self, x):
+        return np.array(x, dtype=float)
+
+    def constraint_jacobian(self, x):
+        return np.eye(len(x))
+
+    def constraint_weighted_hessian(self, x, mu):
+        return np.zeros((len(x), len(x)))
+
+    def constraint_param(self, x):
+        return np.zeros((len(x), len(self.parameter_names)))
+
+    def constraint_weighted_jacobian_param(self, x, mu):
+        return np.zeros((len(x), len(self.parameter_names)))
+
+    # Hàm mục tiêu F = -sum_k prob_k * (theta_k*log(1 + R_k) - c1*R_k - c2*R_k^2)
+    def _marginal_welfare(self, x):
+        return self.thetas / (1 + x) - self.c1 - 2 * self.c2 * x
+
+    def objective_gradient(self, x):
+        return -self.probs * self._marginal_welfare(x)
+
+    def objective_hessian(self, x):
+        return np.diag(self.probs * (self.thetas / (1 + x)**2 + 2 * self.c2))
+
+    def objective_gradient_param(self, x):
+        derivative = np.zeros((len(x), len(self.parameter_names)))
+        for k in range(self.num_types):
+            derivative[k, self._theta_col(k)] = -self.probs[k] / (1 + x[k])
+            derivative[k, self._prob_col(k)] = -self._marginal_welfare(x)[k]
+            derivative[k, self._c1_col()] = self.probs[k]
+            derivative[k, self._c2_col()] = 2 * self.probs[k] * x[k]
+        return derivative
+
+    def outputs(self, x):
+        K = self.num_types
+        principal = -self.probs * (self.c1 * x + self.c2 * x**2)
+        agents = self.probs * self.thetas * np.log(1 + x)
+        values = np.concatenate((x, [principal.sum(), agents.sum(), principal.sum() + agents.sum()]))
+
+        grad_x = np.zeros((K + 3, K))
+        grad_p = np.zeros((K + 3, len(self.parameter_names)))
+        grad_x[:K] = np.eye(K)
+        grad_x[K] = -self.probs * (self.c1 + 2 * self.c2 * x)
+        grad_x[K + 1] = self.probs * self.thetas / (1 + x)
+        for k in range(K):
+            grad_p[K, self._prob_col(k)] = -(self.c1 * x[k] + self.c2 * x[k]**2)
+            grad_p[K + 1, self._theta_col(k)] = self.probs[k] * np.log(1 + x[k])
+            grad_p[K + 1, self._prob_col(k)] = self.thetas[k] * np.log(1 + x[k])
+        grad_p[K, self._c1_col()] = -np.dot(self.probs, x)
+        grad_p[K, self._c2_col()] = -np.dot(self.probs, x**2)
+        grad_x[K + 2] = grad_x[K] + grad_x[K + 1]
+        grad_p[K + 2] = grad_p[K] + grad_p[K + 1]
+        return values, grad_x, grad_p
+
+def contract_sensitivities(agent_types=None, contract_menu=None, refine=False):
+    """
+    Jacobian của menu hợp đồng tối ưu (R, P của từng type) và lợi ích kỳ vọng của
+    Principal / Agents / xã hội theo theta, prob, SAT_COST_C1 và SAT_COST_C2.
+
+    Args:
+        agent_types (dict, optional): Bảng type, mặc định config.AGENT_TYPES.
+        contract_menu (dict, optional): Menu tối ưu đã tính; nếu không có sẽ được giải.
+        refine (bool): Làm chính xác nghiệm bằng Newton trước khi tính Jacobian. Mặc định
+            False: chỉ một lần giải hệ KKT, sai số tới cỡ 1e-3 tương đối; True: sai số cỡ 1e-6.
+
+    Returns:
+        pd.DataFrame: Mỗi dòng là một đại lượng đầu ra (cột 'Value' là giá trị tại nghiệm),
+                      mỗi cột còn lại là đạo hàm theo một tham số. None nếu giải thất bại.
+    """
+    if agent_types is None:
+        agent_types = config.AGENT_TYPES
+    if contract_menu is None:
+        contract_menu = contract_solver.design_optimal_contracts(agent_types)
+        if not contract_menu:
+            return None
+    problem = ContractKKT(agent_types)
+    return problem.to_frame(*problem.sensitivities(problem.solution_from_menu(contract_menu), refine))
+
+def centralized_sensitivities(agent_types=None, allocation=None, refine=False):
+    """
+    Jacobian của phân bổ tối ưu của Social Planner và các lợi ích kỳ vọng theo
+    theta, prob, SAT_COST_C1 và SAT_COST_C2 (định dạng và ý nghĩa của refine như
+    contract_sensitivities).
+    """
+    if agent_types is None:
+        agent_types = config.AGENT_TYPES
+    if allocation is None:
+        allocation = baselines.solve_centralized_optimal(agent_types)
+        if any(R is None for R in allocation):
+            return None
+    problem = CentralizedKKT(agent_types)
+    return problem.to_frame(*problem.sensitivities(np.array(allocation, dtype=float), refine))
+
+def _parameter_value(agent_types, parameter):
+    """Giá trị hiện tại của một tham số theo tên trong parameter_names."""
+    if parameter in ('SAT_COST_C1', 'SAT_COST_C2'):
+        return getattr(config, parameter)
+    key, name = parameter[:-1].split('[', 1)
+    return agent_types[name][key]
+
+def _perturbed(agent_types, parameter, delta):
+    """Bản sao bảng type với một tham số bị thay đổi; tham số chi phí được đặt vào config."""
+    types = {name: dict(params) for name, params in agent_types.items()}
+    for key in ('theta', 'prob'):
+        for name in types:
+            if parameter == f"{key}[{name}]":
+                types[name][key] += delta
+    if parameter in ('SAT_COST_C1', 'SAT_COST_C2'):
+        setattr(config, parameter, getattr(config, parameter) + delta)
+    return types
+
+def check_against_finite_differences(agent_types=None, relative_step=1e-6, rtol=1e-4, refine=True):
+    """
+    So sánh Jacobian KKT với sai phân trung tâm (giải lại bài toán cho mỗi tham số
+    bị nhiễu ±h). Các nghiệm giải lại được làm chính xác bằng Newton để sai số của
+    SLSQP không lấn át sai phân; refine là tùy chọn của phía Jacobian KKT được kiểm tra.
+
+    Returns:
+        dict: Sai số tương đối lớn nhất cho 'contract' và 'centralized';
+              ném AssertionError nếu vượt rtol.
+    """
+    if agent_types is None:
+        agent_types = config.AGENT_TYPES
+
+    def contract_outputs(types):
+        problem = ContractKKT(types)
+        x = problem.solution_from_menu(contract_solver.design_optimal_contracts(types))
+        x, _ = problem.refine(x, problem.select_active_set(x))
+        return problem.outputs(x)[0]
+
+    def centralized_outputs(types):
+        problem = CentralizedKKT(types)
+        x = np.array(baselines.solve_centralized_optimal(types), dtype=float)
+        x, _ = problem.refine(x, problem.select_active_set(x))
+        return problem.outputs(x)[0]
+
+    errors = {}
+    for label, analytic, evaluate in (('contract', contract_sensitivities(agent_types, refine=refine), contract_outputs),
+                                      ('centralized', centralized_sensitivities(agent_types, refine=refine), centralized_outputs)):
+        jacobian = analytic.drop(columns='Value')
+        finite_difference = np.empty(jacobian.shape)
+        for j, parameter in enumerate(jacobian.columns):
+            base = getattr(config, parameter) if parameter.startswith('SAT_COST') else None
+            h = relative_step * max(abs(_parameter_value(agent_types, parameter)), 1e-3)
+            try:
+                plus = evaluate(_perturbed(agent_types, parameter, h))
+            finally:
+                if base is not None:
+                    setattr(config, parameter, base)
+            try:
+                minus = evaluate(_perturbed(agent_types, parameter, -h))
+            finally:
+                if base is not None:
+                    setattr(config, parameter, base)
+            finite_difference[:, j] = (plus - minus) / (2 * h)
+        error = np.abs(jacobian.values - finite_difference) / np.maximum(np.abs(finite_difference), 1.0)
+        errors[label] = float(error.max())
+        if errors[label] > rtol:
+            raise AssertionError(f"{label} sensitivities deviate from finite differences: "
+                                 f"max relative error {errors[label]:.3e} > {rtol:.0e}")
+    return errors
+
+if __name__ == '__main__':
+    pd.set_option('display.width', 200)
+    print("--- Contract Theory sensitivities ---")
+    print(contract_sensitivities())
+    print("\n--- Centralized sensitivities ---")
+    print(centralized_sensitivities())
+    print(f"\nFinite-difference check, max relative errors: {check_against_finite_differences()}")
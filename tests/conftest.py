@@ -0,0 +1,9 @@
+# tests/conftest.py
+#
+# Các module của dự án nằm phẳng ở thư mục gốc: thêm thư mục gốc vào sys.path để
+# chạy `python -m pytest` từ bất kỳ đâu.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
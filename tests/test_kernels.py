@@ -0,0 +1,20 @@
+# tests/test_kernels.py
+
+import pytest
+import kernels
+
+@pytest.fixture
+def restore_backend():
+    previous = kernels.get_backend()
+    yield
+    kernels.set_backend(previous)
+
+@pytest.mark.parametrize('backend', [
+    'numpy',
+    pytest.param('numba', marks=pytest.mark.skipif(not kernels.NUMBA_AVAILABLE, reason="numba is not installed")),
+])
+def test_kernels_match_reference_functions(backend, restore_backend):
+    assert kernels.set_backend(backend) == backend
+    # verify_parity tự ném AssertionError nếu một kernel lệch quá rtol
+    errors = kernels.verify_parity(rtol=1e-9)
+    assert max(errors.values()) <= 1e-9
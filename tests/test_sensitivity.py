@@ -0,0 +1,26 @@
+# tests/test_sensitivity.py
+
+import pytest
+import config
+import sensitivity
+
+THREE_TYPES = {
+    'low': {'theta': 6.0, 'prob': 0.3},
+    'mid': {'theta': 9.0, 'prob': 0.4},
+    'high': {'theta': 12.0, 'prob': 0.3},
+}
+
+# Không làm chính xác bằng Newton, Jacobian KKT chỉ đúng tới độ chính xác của nghiệm SLSQP
+TOLERANCES = {True: 1e-4, False: 5e-3}
+
+@pytest.mark.parametrize('agent_types', [config.AGENT_TYPES, THREE_TYPES], ids=['2-types', '3-types'])
+@pytest.mark.parametrize('refine', [False, True], ids=['default', 'refined'])
+def test_kkt_jacobian_matches_finite_differences(agent_types, refine):
+    # check_against_finite_differences ném AssertionError nếu vượt rtol
+    errors = sensitivity.check_against_finite_differences(agent_types, rtol=TOLERANCES[refine], refine=refine)
+    assert set(errors) == {'contract', 'centralized'}
+
+def test_finite_difference_check_restores_cost_parameters():
+    c1, c2 = config.SAT_COST_C1, config.SAT_COST_C2
+    sensitivity.check_against_finite_differences(THREE_TYPES)
+    assert (config.SAT_COST_C1, config.SAT_COST_C2) == (c1, c2)